@@ -0,0 +1,113 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from utils.generate_hyperlink import (
+    add_hyperlink_formula, adjust_column_width, filter_data, generate_file_path,
+    partition_data, partition_widths, process_branch_data, write_to_excel,
+)
+from utils.message_template import compile_template
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+def make_workbook(path, rows, columns, branches, date_ratio=0.2, nan_ratio=0.1, seed=0):
+    rng = np.random.default_rng(seed)
+    data = {
+        "Branch": rng.choice([f"BR{i:03d}" for i in range(branches)], rows),
+        "Phone": rng.integers(6_000_000_000, 9_999_999_999, rows),
+    }
+    for i in range(max(columns - 2, 0)):
+        if i < (columns - 2) * date_ratio:
+            column = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D")
+        elif i % 2:
+            column = pd.Series(rng.random(rows) * 10_000).round(2)
+        else:
+            column = pd.Series(rng.choice(["alpha", "beta & co", "gamma delta", "epsilon"], rows))
+        column = pd.Series(column)
+        column[rng.random(rows) < nan_ratio] = None
+        data[f"Col{i + 1}"] = column
+
+    data_frame = pd.DataFrame(data)
+    data_frame.to_excel(path, index=False)
+    return data_frame
+
+def timed(timings, stage, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+    return result
+
+def run(args):
+    with tempfile.TemporaryDirectory(prefix="bench_") as work_dir:
+        return run_in(work_dir, args)
+
+def run_in(work_dir, args):
+    source = os.path.join(work_dir, "synthetic.xlsx")
+    make_workbook(source, args.rows, args.columns, args.branches, args.date_ratio, args.nan_ratio)
+
+    timings = {}
+    data_frame = timed(timings, "read_excel", pd.read_excel, source)
+    template = compile_template('C " " D " " E " " [DATE.C]', data_frame.shape[1])
+
+    # Stage by stage, the same steps process_branch_data runs for every branch
+    partitions = timed(timings, "partition", partition_data, data_frame, "A")
+    widths = timed(timings, "partition_widths", partition_widths, data_frame, partitions)
+    for code, branch_name in enumerate(partitions):
+        branch_data, _ = timed(timings, "filter_data", filter_data, data_frame, branch_name, "A", partitions)
+        branch_file_path = generate_file_path(branch_name, source, work_dir, 0, False)
+        writer = timed(timings, "to_excel", write_to_excel, branch_data, branch_file_path)
+        worksheet = writer.sheets['Sheet1']
+        timed(timings, "add_hyperlink_formula", add_hyperlink_formula, worksheet, branch_data, "B", "AZ", template)
+        timed(timings, "adjust_column_width", adjust_column_width, worksheet, branch_data, widths[code] if widths else None)
+        timed(timings, "save", writer._save)
+
+    # And once more end to end, the way the app calls it
+    start = time.perf_counter()
+    for branch_name in partitions:
+        process_branch_data(data_frame, branch_name, source, work_dir, "A", "B", "AZ", template, partitions=partitions)
+    end_to_end = time.perf_counter() - start
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "pandas": pd.__version__,
+        "params": vars(args),
+        "stages": {stage: {"seconds": round(seconds, 4), "rows_per_second": round(args.rows / seconds) if seconds else None} for stage, seconds in timings.items()},
+        "process_branch_data": {"seconds": round(end_to_end, 4), "rows_per_second": round(args.rows / end_to_end) if end_to_end else None},
+        "files": len(partitions),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_pipeline", description="Time the generation pipeline on a synthetic workbook.")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--columns", type=int, default=10)
+    parser.add_argument("--branches", type=int, default=20)
+    parser.add_argument("--date-ratio", type=float, default=0.2, help="share of the extra columns holding dates")
+    parser.add_argument("--nan-ratio", type=float, default=0.1, help="share of blank cells in the extra columns")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(report)
+    else:
+        print(report)
+
+if __name__ == "__main__":
+    main()
@@ -6,28 +6,35 @@ Date: March 9, 2024
 Description: A sample application for generating whatsapp messages.
 """
 
+import importlib
 import os
-import re
 import json
 import sys
 import threading
-import numpy as np
-import pandas as pd
+import time
 import customtkinter as ctk
 from PIL import Image
-from datetime import datetime, timedelta
+from multiprocessing import freeze_support
 from tkinter.filedialog import askdirectory, askopenfilename
-from utils.generate_hyperlink import excel_column_letter_to_index, process_branch_data
+from utils.app_config import cache_dir, config, data_dir, state_file
+from utils.profiling import profiling_enabled
 
 ctk.set_appearance_mode("dark")
 
-class ExcelHyperlinkSplitter:
-    pattern = r"([A-Za-z]+)|(\"[^\"]*\")|(\[[A-Za-z]+\.[A-Za-z]+\])"
+def import_backend(root, on_error):
+    # pandas, numpy and openpyxl take seconds to import, so they load here while the window is already up.
+    # The methods below import what they need themselves, which is instant once this has run
+    try:
+        importlib.import_module("utils.engine")
+    except ImportError as e:
+        root.after(0, on_error, str(e), "red")
 
-    DATA_DIR = os.path.join(os.path.expanduser("~"), "ExcelHyperlinkSplitter")
+class ExcelHyperlinkSplitter:
+    DATA_DIR = data_dir
     os.makedirs(DATA_DIR, exist_ok=True)
 
-    JSON_FILE = os.path.join(DATA_DIR, "state_data.json")
+    JSON_FILE = state_file
+    CACHE_DIR = cache_dir
 
     @staticmethod
     def resource_path(relative_path):
@@ -44,13 +51,24 @@ class ExcelHyperlinkSplitter:
 
     def __init__(self, root):
         self.root = root
+        self.file_path = ""
+        self.output_file_path = ""
+        self.column_map = None
+        self.load_report = ""
+        self.load_seconds = None
+        self.queue_window = None
+        self.queue_statuses = None
+        self.preview = None
+        self.preview_page = 0
+        self.stats_cancel = None
+        self.stats_key = None
         print(title:=f"Whatsapp Message Generator for Excel - v1.0")
         self.root.title(title)
         self.root.iconbitmap(ExcelHyperlinkSplitter.resource_path(r"assets\excel-icon.ico"))
 
         # Set the dimensions of the window (width x height)
         self.window_width = 600
-        self.window_height = 700
+        self.window_height = 745
 
         # Get the screen width and height
         screen_width = self.root.winfo_screenwidth()
@@ -82,6 +100,7 @@ class ExcelHyperlinkSplitter:
         self.format_frame[1].bind('<<Modified>>', self.on_text_change)
 
         self.preview_frame = self.create_frame(row=7, height=160, label="Preview message", state="disabled", margine_y=15)
+        self.create_preview_controls(row=7)
         # self.preview_entry = ctk.CTkEntry(self.root, height=28, width=86)
 
         # self.c = ctk.CTkCanvas(self.root, width=78, height=28+15, bg="#1D1E1E", highlightthickness=0)
@@ -108,12 +127,15 @@ class ExcelHyperlinkSplitter:
         self.recover = ctk.CTkButton(self.bottom_frame, image=ctk.CTkImage(Image.open((ExcelHyperlinkSplitter.resource_path(r"assets\load.png"))), size=(20, 20)), text="", width=40, height=30, bg_color="transparent", fg_color=['#3B8ED0', '#1F6AA5'], command=self.load_state)
         self.recover.grid(row=0, column=1, padx=11, sticky="ewns")
 
+        self.queue_open_btn = ctk.CTkButton(self.bottom_frame, text="QUEUE", width=40, height=30, font=("Helvetica", 13, "bold"), command=self.open_queue)
+        self.queue_open_btn.grid(row=0, column=2, padx=(0, 11), sticky="ewns")
+
         self.process_btn = ctk.CTkButton(self.root, text=f"START", command=self.hyperlink_splitter, height=40, width=10, font=("Helvetica", 15, "bold"))
         self.process_btn.grid(row=11, column=3, padx=(0, 15), sticky="wens")
 
         
-    def save_state(self):
-        state_data = {
+    def current_state(self):
+        return {
             "file_path": self.file_path,
             "output_path": self.output_file_path,
             "branch_column": self.branch_column.get(),
@@ -123,6 +145,9 @@ class ExcelHyperlinkSplitter:
             "chunk_size": self.chunk_size.get(),
             "splitby_branch": self.branch_checkbox.get()
         }
+
+    def save_state(self):
+        state_data = self.current_state()
         with open(ExcelHyperlinkSplitter.JSON_FILE, "w") as file:
             json.dump(state_data, file)
 
@@ -130,33 +155,47 @@ class ExcelHyperlinkSplitter:
         try:
             with open(ExcelHyperlinkSplitter.JSON_FILE, "r") as file:
                 state_data = json.load(file)
-                self.excel_widgets[3].set(state_data["file_path"]) 
-                self.file_path = state_data["file_path"]
+        except FileNotFoundError as e:
+            self.update_status(str(e), "red")
+            return
 
-                self.output_widgets[3].set(state_data["output_path"])
-                self.output_file_path = state_data["output_path"]
+        self.excel_widgets[3].set(state_data["file_path"])
+        self.file_path = state_data["file_path"]
 
-                self.load_excel_file(state_data["file_path"])
+        self.output_widgets[3].set(state_data["output_path"])
+        self.output_file_path = state_data["output_path"]
 
-                self.format_frame[1].delete("1.0", "end")
-                self.format_frame[1].insert("end", state_data["format_string"])
-  
-                self.phone_column.delete("0", "end")
-                self.phone_column.insert("0", state_data["phone_column"])
+        # The workbook is parsed off the Tk thread like a selected file, the other fields are filled in once it is loaded
+        self.excel_widgets[2].configure(state="disabled")
+        self.recover.configure(state="disabled")
+        self.progress_bar.configure(mode="indeterminate", progress_color="lightblue")
+        self.progress_bar.start()
+        self.update_status("restoring previous state...", "blue")
+        threading.Thread(target=self.restore_state, args=(state_data,)).start()
 
-                self.checkbox_var.set(state_data["splitby_branch"])
-                self.show_chunk_entry(data=state_data["branch_column"])
+    def restore_state(self, state_data):
+        loaded = self.load_excel_file(state_data["file_path"], state_data)
+        self.root.after(0, self.fill_state, state_data, loaded)
 
-                self.hyperlink_column.delete("0", "end")
-                self.hyperlink_column.insert("0", state_data["hyperlink_column"])
+    def fill_state(self, state_data, loaded):
+        self.format_frame[1].delete("1.0", "end")
+        self.format_frame[1].insert("end", state_data["format_string"])
 
-                self.chunk_size.delete("0", "end")
-                self.chunk_size.insert("0", state_data["chunk_size"])
+        self.phone_column.delete("0", "end")
+        self.phone_column.insert("0", state_data["phone_column"])
 
-                self.update_status("Previous state loaded successfully.", "green")
-          
-        except FileNotFoundError as e:
-            self.update_status(str(e), "red")
+        self.checkbox_var.set(state_data["splitby_branch"])
+        self.show_chunk_entry(data=state_data["branch_column"])
+
+        self.hyperlink_column.delete("0", "end")
+        self.hyperlink_column.insert("0", state_data["hyperlink_column"])
+
+        self.chunk_size.delete("0", "end")
+        self.chunk_size.insert("0", state_data["chunk_size"])
+
+        self.recover.configure(state="normal")
+        if loaded:
+            self.update_status(f"Previous state loaded successfully. {self.load_report}".strip(), "green")
 
     def show_chunk_entry(self, data=None):
         if not self.checkbox_var.get():
@@ -199,6 +238,15 @@ class ExcelHyperlinkSplitter:
         self.hyperlink_column = ctk.CTkEntry(frame, font=("Courier New", 14), placeholder_text="AB", width=50, validate="key", validatecommand=(self.validation_1, "%S"))
         self.hyperlink_column.grid(row=1, column=1, padx=(40,40), pady=(0, 15), sticky="e")
 
+        # Profiling
+        label_widget = ctk.CTkLabel(frame, text="Profile run:", font=("Comic Sans MS", 16, "bold"))
+        label_widget.grid(row=2, column=0, pady=(0, 15), sticky="w")
+
+        self.profile_var = ctk.BooleanVar()
+        self.profile_var.set(profiling_enabled)
+        self.profile_checkbox = ctk.CTkCheckBox(frame, text="", border_width=2, border_color=['#979DA2', '#565B5E'], variable=self.profile_var, width=2, checkbox_height=28, checkbox_width=28)
+        self.profile_checkbox.grid(row=2, column=1, padx=(40,40), pady=(0, 15), sticky="w")
+
         label_widget = ctk.CTkLabel(frame, text="Split by column value: ", font=("Comic Sans MS", 16, "bold"))
         label_widget.grid(row=0, column=2, padx=(0, 37), pady=(0, 15), sticky="w")
 
@@ -230,174 +278,286 @@ class ExcelHyperlinkSplitter:
 
 
     def generate_files(self):
-        branch_column_index = excel_column_letter_to_index(self.branch_column.get())
-        branch_names = self.df.iloc[1:, branch_column_index].astype(str).str.strip().unique()
-
-        for branch_name in branch_names:
-            no_branch_col = process_branch_data(
-                self.df,
-                branch_name, 
-                self.file_path,
-                self.output_file_path,
-                self.branch_column.get() if self.branch_checkbox.get() else "",
-                self.phone_column.get(), 
-                self.hyperlink_column.get(), 
-                self.concat_string[:-1], 
-                int(self.chunk_size.get())
-            )
-            if no_branch_col:
-                break
+        from utils.engine import Job, run_job, run_profiled
+        try:
+            job = Job.from_state(self.current_state())
+            if self.profile_var.get():
+                progress, report = run_profiled(job, self.df, self.column_map, self.load_seconds, on_progress=self.report_progress, cancel=self.cancel_event)
+                self.root.after(0, self.generation_finished, progress, None, report.summary())
             else:
-                print(f"{branch_name}...done!")
+                progress = run_job(job, self.df, self.column_map, on_progress=self.report_progress, cancel=self.cancel_event)
+                self.root.after(0, self.generation_finished, progress, None)
+        except Exception as e:
+            self.root.after(0, self.generation_finished, None, e)
 
-        
-        self.configure_progress_bar("lightgreen")
-        self.update_status("Successfully generated!", "green")
+    def report_progress(self, progress):
+        # Called from the worker thread, so hand the widget updates over to the Tk main loop
+        print(f"{os.path.basename(progress.file_path)}...done!")
+        self.root.after(0, self.show_progress, progress.fraction, progress.summary())
+
+    def show_progress(self, fraction, summary):
+        self.progress_bar.set(fraction)
+        self.update_status(summary, "blue")
+
+    def generation_finished(self, progress, error, timing_summary=""):
+        self.process_btn.configure(text="START", command=self.hyperlink_splitter, state="normal")
+
+        if error is not None:
+            self.configure_progress_bar("red")
+            self.update_status(str(error), "red")
+        elif progress.cancelled:
+            self.configure_progress_bar("orange")
+            self.update_status(f"Cancelled after {progress.summary()}", "orange")
+        else:
+            self.configure_progress_bar("lightgreen")
+            summary = f"Successfully generated! {progress.files_done} files, {progress.rows_per_second:,.0f} rows/s"
+            self.update_status(f"{summary} | {timing_summary}" if timing_summary else summary, "green")
+            self.save_state()
 
-        self.save_state()
+    def cancel_generation(self):
+        self.cancel_event.set()
+        self.process_btn.configure(state="disabled")
+        self.update_status("Cancelling after the current file...", "orange")
 
     def hyperlink_splitter(self):
-        if self.output_widgets[1].get() == "":
-            self.update_status("Please provde the output directory", "red")
+        from utils.engine import Job
+        from utils.load_excel import unloaded_error
+        job = Job.from_state(self.current_state())
+        error = job.validate()
+        if error:
+            self.update_status(error, "red")
             return
 
-        if self.phone_column.get() == "":
-            self.update_status("Please provide the phone column", "red")
-            return
-        
-        if self.hyperlink_column.get() == "":
-            self.update_status("Please provide the hyperlink column", "red")
+        error = unloaded_error(job.file_path, job.format_string, self.column_map, job.phone_column, job.branch_column if job.splitby_branch else "")
+        if error:
+            self.update_status(error, "red")
             return
-        
-        if self.branch_checkbox.get():  # need to fix the branch name ~
-            if self.branch_column.get() == "":
-                self.update_status("Please provide the column for splitting by value", "red")
-                return
-        else:
-            if self.chunk_size.get() == "":
-                self.update_status("Please provide the chunk size", "red")
-                return
 
-        self.progress_bar.configure(mode="indeterminate", progress_color="lightblue")
-        self.progress_bar.start()
+        self.cancel_event = threading.Event()
+        self.progress_bar.configure(mode="determinate", progress_color="lightblue")
+        self.progress_bar.set(0)
+        self.process_btn.configure(text="CANCEL", command=self.cancel_generation)
         self.update_status("Please wait...", "blue")
         threading.Thread(target=self.generate_files).start()
 
-    @staticmethod
-    def remove_extra_spaces(sentence):
-        cleaned_sentence = re.sub(r' +', ' ', sentence).strip()
-        return cleaned_sentence
-    
-    def extract_data(self, content):
+    def open_queue(self):
+        if self.queue_window is not None and self.queue_window.winfo_exists():
+            self.queue_window.focus()
+            return
 
-        format_string = ""
-        self.concat_string = ""
-        matches = re.finditer(ExcelHyperlinkSplitter.pattern, content, re.MULTILINE)
+        self.queue_window = ctk.CTkToplevel(self.root)
+        self.queue_window.title("Job queue")
+        self.queue_window.geometry("600x420")
+        self.queue_window.columnconfigure((0, 1, 2), weight=1)
+
+        self.queue_list = ctk.CTkScrollableFrame(self.queue_window, height=300)
+        self.queue_list.grid(row=0, column=0, columnspan=3, padx=15, pady=15, sticky="nsew")
+
+        add_btn = ctk.CTkButton(self.queue_window, text="ADD CURRENT", command=self.add_current_to_queue, height=40, font=("Helvetica", 15, "bold"))
+        add_btn.grid(row=1, column=0, padx=(15, 5), pady=(0, 15), sticky="ew")
+        clear_btn = ctk.CTkButton(self.queue_window, text="CLEAR", command=self.clear_queue, height=40, font=("Helvetica", 15, "bold"))
+        clear_btn.grid(row=1, column=1, padx=5, pady=(0, 15), sticky="ew")
+        self.queue_btn = ctk.CTkButton(self.queue_window, text="RUN ALL", command=self.start_queue, height=40, font=("Helvetica", 15, "bold"))
+        self.queue_btn.grid(row=1, column=2, padx=(5, 15), pady=(0, 15), sticky="ew")
+        self.show_queue()
+
+    def show_queue(self):
+        from utils.job_queue import load_queue
+        for widget in self.queue_list.winfo_children():
+            widget.destroy()
+
+        self.queue_labels = []
+        for index, entry in enumerate(load_queue()):
+            text = f"{os.path.basename(entry['file_path'])}: profile '{entry.get('profile', '')}'"
+            label = ctk.CTkLabel(self.queue_list, text=text, font=("Consolas", 13), anchor="w", justify="left")
+            label.grid(row=index, column=0, sticky="w")
+            self.queue_labels.append(label)
+
+        # A run that is still going keeps its statuses when the window is reopened
+        for index, status in enumerate(self.queue_statuses or []):
+            self.show_queue_status(index, status.summary(), status.state)
+
+    def add_current_to_queue(self):
+        from utils.engine import Job
+        from utils.job_queue import add_to_queue, free_profile_name, queue_conflict, save_profile
+        job = Job.from_state(self.current_state())
+        error = job.validate() if job.file_path else "Please select the excel file"
+        error = error or queue_conflict(job)
+        if error:
+            self.update_status(error, "red")
+            return
 
-        for match in matches:
-            
-            # Extract data from each group
-            column = match.group(1)
-            others = match.group(2)
-            square = match.group(3)
-
-            if column is not None:
-                column_index = excel_column_letter_to_index(column)
-                try:
-                    cell_value = self.df.iloc[0, column_index]
-
-                    if not isinstance(cell_value, str):
-                        if pd.isna(cell_value):  # Assuming you are working with pandas NaN
-                            cell_value = "N/A"
-                        else:
-                            cell_value = str(int(cell_value)) if not isinstance(cell_value, datetime) else str(cell_value)
-
-                    self.concat_string += f"IF(ISBLANK({column}#), \"N/A\", {column}#),"
-                    format_string += cell_value
-                except Exception as e:
-                    # print(e)
-                    pass
-
-            if others is not None:
-
-                try:
-                    if '&' in others:
-                        self.concat_string += f"{others.replace('&', '%26')},"
-                    elif '\\n' in others:
-                        self.concat_string += f"{others.replace('\\n', '%0A')},"
-                        format_string += f"{others.replace("\\n", "\n")[1:-1]}"
-                    elif '\\t' in others:
-                        self.concat_string += f"{others.replace('\\t', '%09')},"
-                        format_string += f"{others.replace('\\t', '\t')[1:-1]}"
-                    else:
-                        self.concat_string += f"{others},"
-                        format_string += others[1:-1]
-
-                except Exception as e:
-                    pass
-
-            if square is not None:
-                square = square.upper()
-                mode, index = square.split('.')
-                mode = mode[1:]
-                column_index = excel_column_letter_to_index(index[:-1])
-                self.update_status(f"", "black")
-
-                try:
-                    if "DATE" == mode:
-                        # self.concat_string += f"TEXT({index[:-1]}#,\"dd-mm-yyyy\"),"
-                        self.concat_string += f"IF(ISBLANK({index[:-1]}#), \"N/A\", TEXT({index[:-1]}#,\"dd-mm-yyyy\")),"
-
-                        cell_value = self.df.iloc[0, column_index]
-
-                        if pd.isna(cell_value):
-                            format_string += "N/A"
-                        else:
-                            if isinstance(cell_value, datetime):
-                                date_value = cell_value
-                            else:
-                                if not isinstance(cell_value, str):
-                                    cell_value = str(cell_value)
-
-                                serial_number = int(cell_value)
-                                date_value = datetime(1899, 12, 30) + timedelta(days=serial_number)
-
-                            format_string += date_value.strftime('%d-%m-%Y')
-
-                    elif "AMPR" == mode:
-                        self.concat_string += f"SUBSTITUTE({index[:-1]}#, \"&\", \"%26\"),"
-
-                        cell_value = self.df.iloc[0, column_index]
-
-                        if pd.isna(cell_value):
-                            format_string += "N/A"
-                        else:
-                            if not isinstance(cell_value, str):
-                                cell_value = str(cell_value)
-
-                            format_string += cell_value
-                    else:
-                        self.update_status(f"Invalid mode '{mode}' is being used!", "orange")
-
-                        
-                except Exception as e:
-                    self.update_status(str(e), "red")
-                    
-        format_string = ExcelHyperlinkSplitter.remove_extra_spaces(format_string)
+        # Each input file gets a profile of its own, named after the file; files of the same name get "export (2)"
+        profile = free_profile_name(os.path.splitext(os.path.basename(job.file_path))[0], job.file_path)
+        save_profile(profile, job)
+        add_to_queue(job.file_path, profile)
+        self.queue_statuses = None
+        self.show_queue()
+        self.update_status(f"{os.path.basename(job.file_path)} added to the queue", "green")
+
+    def clear_queue(self):
+        from utils.job_queue import save_queue
+        save_queue([])
+        self.queue_statuses = None
+        self.show_queue()
+
+    def start_queue(self):
+        from utils.job_queue import load_queue
+        entries = load_queue()
+        if not entries:
+            self.update_status("The queue is empty, add the current job first", "red")
+            return
+
+        self.queue_cancel = threading.Event()
+        self.queue_statuses = None
+        self.queue_btn.configure(text="CANCEL", command=self.cancel_queue)
+        self.update_status(f"Running {len(entries)} queued jobs...", "blue")
+        threading.Thread(target=self.run_queue_jobs, args=(entries,)).start()
+
+    def run_queue_jobs(self, entries):
+        from utils.job_queue import queue_summary, run_queue
+        try:
+            statuses, elapsed = run_queue(entries, on_status=self.report_queue_status, cancel=self.queue_cancel)
+            self.root.after(0, self.queue_finished, statuses, queue_summary(statuses, elapsed), None)
+        except Exception as e:
+            self.root.after(0, self.queue_finished, None, "", e)
+
+    def report_queue_status(self, index, status):
+        # Called from the queue thread, so hand the widget updates over to the Tk main loop
+        self.root.after(0, self.show_queue_status, index, status.summary(), status.state)
+
+    def show_queue_status(self, index, summary, state):
+        if self.queue_window is None or not self.queue_window.winfo_exists() or index >= len(self.queue_labels):
+            return
+        colors = {"queued": "grey", "running": "lightblue", "done": "lightgreen", "failed": "red", "cancelled": "orange"}
+        self.queue_labels[index].configure(text=summary, text_color=colors[state])
+
+    def cancel_queue(self):
+        self.queue_cancel.set()
+        self.queue_btn.configure(state="disabled")
+        self.update_status("Cancelling the queue after the current files...", "orange")
+
+    def queue_finished(self, statuses, summary, error):
+        self.queue_statuses = statuses
+        if self.queue_window is not None and self.queue_window.winfo_exists():
+            self.queue_btn.configure(text="RUN ALL", command=self.start_queue, state="normal")
+
+        if error is not None:
+            self.update_status(str(error), "red")
+        elif all(status.state == "done" for status in statuses):
+            self.update_status(summary, "green")
+        else:
+            self.update_status(summary, "orange")
+
+    def create_preview_controls(self, row):
+        frame = ctk.CTkFrame(self.root, fg_color="transparent")
+        frame.grid(row=row, column=1, columnspan=3, padx=(0, 15), pady=(15, 5), sticky="e")
+
+        self.all_rows_var = ctk.BooleanVar()
+        self.all_rows_var.set(config.getboolean('preview', 'ALL_ROWS', fallback=False))
+        all_rows = ctk.CTkCheckBox(frame, text="All rows", font=("Helvetica", 13, "bold"), border_width=2, border_color=['#979DA2', '#565B5E'], variable=self.all_rows_var, command=self.refresh_preview, checkbox_height=20, checkbox_width=20)
+        all_rows.grid(row=0, column=0, padx=(0, 10))
+
+        previous_btn = ctk.CTkButton(frame, text="<", width=28, height=24, font=("Helvetica", 13, "bold"), command=lambda: self.turn_page(-1))
+        previous_btn.grid(row=0, column=1)
+        self.page_label = ctk.CTkLabel(frame, text="", width=90, font=("Consolas", 13))
+        self.page_label.grid(row=0, column=2)
+        next_btn = ctk.CTkButton(frame, text=">", width=28, height=24, font=("Helvetica", 13, "bold"), command=lambda: self.turn_page(1))
+        next_btn.grid(row=0, column=3)
+
+    def preview_phone(self):
+        from utils.generate_hyperlink import excel_column_letter_to_index
+        from utils.load_excel import remap_column
+        # Link lengths include the phone number once a phone column inside the sheet is entered
+        phone = self.phone_column.get()
+        mob_index = remap_column(phone, self.column_map) if phone else None
+        if mob_index is None or excel_column_letter_to_index(mob_index) >= self.df.shape[1]:
+            return None
+        return mob_index.upper()
+
+    def preview_text(self):
+        if not self.all_rows_var.get() or self.preview is None:
+            self.page_label.configure(text="")
+            return self.template.preview(self.df)
+
+        mob_index = self.preview_phone()
+        stats = self.preview.cached_stats(self.template, mob_index)
+        if stats is None:
+            self.request_stats(mob_index)
+        self.page_label.configure(text=f"{self.preview_page + 1:,}/{self.preview.page_count():,}")
+        header = stats.summary() if stats is not None else "Computing link statistics..."
+        return f"{header}\n\n{self.preview.page(self.template, self.preview_page)}"
+
+    def request_stats(self, mob_index):
+        # Page turns and refreshes leave a computation for the same rows, template and phone column running;
+        # every keystroke compiles a new template, so one still running for an older one is dropped
+        key = (self.preview, self.template.tokens, mob_index)
+        if key == self.stats_key:
+            return
+        if self.stats_cancel is not None:
+            self.stats_cancel.set()
+        self.stats_key = key
+        self.stats_cancel = threading.Event()
+        threading.Thread(target=self.compute_stats, args=(self.preview, self.template, mob_index, self.stats_cancel), daemon=True).start()
+
+    def compute_stats(self, preview, template, mob_index, cancel):
+        try:
+            stats = preview.link_stats(template, mob_index, cancel)
+        except Exception as e:
+            self.root.after(0, self.stats_failed, str(e))
+            return
+        if stats is not None:
+            self.root.after(0, self.stats_ready, preview, template)
+
+    def stats_failed(self, error):
+        # Lets the next refresh try again
+        self.stats_key = None
+        self.update_status(error, "red")
 
+    def stats_ready(self, preview, template):
+        if preview is self.preview and template.tokens == self.template.tokens:
+            self.refresh_preview()
+
+    def turn_page(self, step):
+        if self.preview is None:
+            return
+        self.preview_page = min(max(self.preview_page + step, 0), self.preview.page_count() - 1)
+        self.refresh_preview()
+
+    def refresh_preview(self):
+        if self.preview is None:
+            return
+        self.show_preview(self.preview_text())
+        self.preview_frame[1].yview_moveto(0)
+
+    def show_preview(self, format_string):
         self.preview_frame[1].configure(state="normal")
         self.preview_frame[1].delete("1.0", "end")
         self.preview_frame[1].insert("end", format_string)
         self.preview_frame[1].configure(state="disabled")
 
+    def extract_data(self, content):
+        from utils.load_excel import compile_loaded_template
+        self.template = compile_loaded_template(content, self.df, self.column_map)
+
+        if self.template.invalid_modes:
+            self.update_status(f"Invalid mode '{self.template.invalid_modes[0]}' is being used!", "orange")
+
+        try:
+            format_string = self.preview_text()
+        except Exception as e:
+            format_string = ""
+            self.update_status(str(e), "red")
 
+        self.show_preview(format_string)
 
     def on_text_change(self, event=None):
         if self.format_frame[1].edit_modified():
             content = self.format_frame[1].get("1.0", "end-1c")
             self.extract_data(content)
             self.format_frame[1].edit_modified(False)
-            self.preview_frame[1].yview(ctk.END)
+            if not self.all_rows_var.get():
+                self.preview_frame[1].yview(ctk.END)
 
     def create_frame(self, row, height, label, state="normal", margine_y=15):
         # Create a Label for the Entry box and place it at [row, 0]
@@ -427,7 +587,7 @@ class ExcelHyperlinkSplitter:
 
     def open_file_dialog(self, entry_var, type):
         if type == "askopenfilename":
-            self.file_path = askopenfilename(filetypes=[("Excel Files", "*.xlsx;*.xls")])
+            self.file_path = askopenfilename(filetypes=[("Data Files", "*.xlsx;*.xls;*.csv;*.parquet"), ("Excel Files", "*.xlsx;*.xls"), ("CSV Files", "*.csv"), ("Parquet Files", "*.parquet")])
             if self.file_path != "":
                 entry_var.set(self.file_path)
                 self.excel_widgets[2].configure(state="disabled")
@@ -439,9 +599,24 @@ class ExcelHyperlinkSplitter:
             self.output_file_path = askdirectory()
             entry_var.set(self.output_file_path)
 
-    def load_excel_file(self, file_path):
+    def load_excel_file(self, file_path, state_data=None):
+        from utils.load_excel import load_excel
+        from utils.message_preview import MessagePreview
+        from utils.streaming_pipeline import streaming_enabled
         try:
-            self.df = pd.read_excel(file_path)
+            state_data = state_data or {}
+            start = time.perf_counter()
+            self.df, self.column_map, self.load_report = load_excel(
+                file_path,
+                state_data.get("format_string"),
+                state_data.get("phone_column", ""),
+                state_data.get("branch_column", "") if state_data.get("splitby_branch") else "",
+                ExcelHyperlinkSplitter.CACHE_DIR,
+                streaming_enabled
+            )
+            self.load_seconds = time.perf_counter() - start
+            self.preview = MessagePreview(self.df, self.column_map)
+            self.preview_page = 0
 
             self.excel_widgets[2].configure(state="normal")
 
@@ -455,11 +630,14 @@ class ExcelHyperlinkSplitter:
             # Trigger text change event
             self.on_text_change()
 
-            self.update_status("Successfully Loaded!", "green")
-            
+            self.update_status(f"Successfully Loaded! {self.load_report}".strip(), "green")
+            return True
+
         except Exception as e:
+            self.excel_widgets[2].configure(state="normal")
             self.configure_progress_bar("red")
             self.update_status(str(e), "red")
+            return False
 
     def configure_progress_bar(self, color):
         self.progress_bar.configure(mode="determinate", progress_color=color)
@@ -472,6 +650,8 @@ class ExcelHyperlinkSplitter:
 
 
 if __name__ == "__main__":
+    freeze_support()
     root = ctk.CTk()
     app = ExcelHyperlinkSplitter(root)
+    threading.Thread(target=import_backend, args=(root, app.update_status), daemon=True).start()
     root.mainloop()
@@ -0,0 +1,30 @@
+import pandas as pd
+import pytest
+from utils.file_formats import read_batches
+from utils.generate_hyperlink import render_dates, stream_output
+from utils.message_template import compile_template
+
+def test_streamed_parquet_keeps_columns_blank_in_the_first_batch(tmp_path):
+    pytest.importorskip("pyarrow")
+    source = tmp_path / "export.xlsx"
+    pd.DataFrame({
+        "Name": [f"n{i}" for i in range(6)],
+        "Phone": [9876543210 + i for i in range(6)],
+        "Note": [None, None, "late", None, "paid", None],
+        "Amount": [None, None, None, 12, None, 7.5],
+    }).to_excel(source, index=False)
+
+    columns = pd.read_excel(source, nrows=0).columns
+    target = tmp_path / "out.parquet"
+    template = compile_template('"Hi " A', len(columns))
+    stream_output(read_batches(source, columns, 2), columns, str(target), "B", "E", template)
+
+    written = pd.read_parquet(target)
+    assert written["Note"].tolist() == [None, None, "late", None, "paid", None]
+    assert written["Amount"].iloc[[3, 5]].tolist() == [12, 7.5]
+    assert written["Amount"].isna().sum() == 4
+
+def test_csv_dates_render_like_excel_dates(tmp_path):
+    source = tmp_path / "export.csv"
+    pd.DataFrame({"Due": pd.to_datetime(["2024-08-31", "2024-01-05"])}).to_csv(source, index=False)
+    assert render_dates(pd.read_csv(source)["Due"]).tolist() == ["31-08-2024", "05-01-2024"]
@@ -0,0 +1,57 @@
+import re
+import pandas as pd
+from utils.generate_hyperlink import excel_column_letter_to_index, render_messages
+from utils.message_template import compile_template
+
+def split_args(text):
+    # Top-level arguments of a formula call, commas inside quotes or brackets don't count
+    args, depth, quoted, start = [], 0, False, 0
+    for position, char in enumerate(text):
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            args.append(text[start:position].strip())
+            start = position + 1
+    args.append(text[start:].strip())
+    return args
+
+def evaluate(expression, row):
+    # Just enough of Excel for the message formulas: literals, cells, IF, ISBLANK and SUBSTITUTE
+    if expression.startswith('"'):
+        return expression[1:-1]
+    call = re.fullmatch(r"([A-Z]+)\((.*)\)", expression, re.DOTALL)
+    if call is None:
+        value = row[excel_column_letter_to_index(re.fullmatch(r"([A-Z]+)\d+", expression).group(1))]
+        return None if pd.isna(value) else value
+    name, args = call.group(1), split_args(call.group(2))
+    if name == "ISBLANK":
+        return evaluate(args[0], row) is None
+    if name == "IF":
+        return evaluate(args[1] if evaluate(args[0], row) else args[2], row)
+    if name == "SUBSTITUTE":
+        value = evaluate(args[0], row)
+        return ("" if value is None else str(value)).replace(evaluate(args[1], row), evaluate(args[2], row))
+    raise AssertionError(f"{name} is not supported here")
+
+def formula_messages(data, template):
+    # What CONCATENATE and TRIM make of each row in formula mode
+    parts = split_args(template.msg_index.replace("\0", "2"))
+    messages = []
+    for row in data.itertuples(index=False):
+        text = "".join("" if (value := evaluate(part, row)) is None else str(value) for part in parts)
+        messages.append(re.sub(" {2,}", " ", text).strip(" "))
+    return messages
+
+def test_link_modes_render_blanks_alike():
+    data = pd.DataFrame({
+        "Name": ["Asha", None, "Ravi"],
+        "Note": [None, "Paid", None],
+        "Branch": ["North", "South", None],
+    })
+    template = compile_template('"Hi " A ", note: " [AMPR.B] " at " C "."', data.shape[1])
+    assert render_messages(data, template.tokens).tolist() == formula_messages(data, template)
+    assert render_messages(data, template.tokens).tolist() == ["Hi Asha, note: at North.", "Hi N/A, note: Paid at South.", "Hi Ravi, note: at N/A."]
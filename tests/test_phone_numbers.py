@@ -0,0 +1,13 @@
+import pandas as pd
+from utils.generate_hyperlink import country_code
+from utils.phone_numbers import normalize_phones
+
+def test_text_numbers_saved_through_a_float_keep_their_digits():
+    numbers, reasons = normalize_phones(pd.Series(["9876543210.0", " 98765-43210.00 ", "9876543210"], dtype=object))
+    assert numbers.tolist() == [int(f"{country_code}9876543210")] * 3
+    assert reasons.tolist() == ["", "", ""]
+
+def test_other_dots_make_a_number_invalid():
+    numbers, reasons = normalize_phones(pd.Series(["98765.43210", "9876543210.5"], dtype="string"))
+    assert numbers.tolist() == [0, 0]
+    assert reasons.tolist() == ["not a phone number", "not a phone number"]
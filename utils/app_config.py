@@ -0,0 +1,14 @@
+import configparser
+import os
+import sys
+
+# Only the standard library is imported here, so the GUI can read its settings before pandas has loaded.
+# config.ini is found next to main.py (or the frozen executable) wherever the app is started from
+app_dir = os.path.dirname(sys.executable) if getattr(sys, "frozen", False) else os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+config = configparser.ConfigParser()
+config.read(os.path.join(app_dir, 'config.ini'))
+
+data_dir = os.path.join(os.path.expanduser("~"), "ExcelHyperlinkSplitter")
+state_file = os.path.join(data_dir, "state_data.json")
+cache_dir = os.path.join(data_dir, "cache")
@@ -0,0 +1,42 @@
+import io
+import os
+import zipfile
+from datetime import datetime
+from utils.file_formats import file_format
+from utils.generate_hyperlink import config
+
+archive_output = config.getboolean('generation', 'ARCHIVE_OUTPUT', fallback=False)
+
+def archive_file_path(file_path, output_path):
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(output_path, f"_ARCHIVE__[{base_name}]_{datetime.now().strftime('%d-%m-%Y')}.zip")
+
+def entry_buffer(file_path):
+    # The savers write here instead of to the path; the name keeps the extension they dispatch on
+    buffer = io.BytesIO()
+    buffer.name = os.path.basename(file_path)
+    return buffer
+
+def save_entry(save, data, file_path, *args):
+    # Runs wherever the file is rendered, worker processes included, and hands back its bytes instead of writing it
+    buffer = entry_buffer(file_path)
+    timings = save(data, buffer, *args)
+    return timings, buffer.getvalue()
+
+class ArchiveWriter:
+    # Adds every generated file to one zip as soon as it is finished, in the order they finish
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.zip_file = zipfile.ZipFile(file_path, "w", zipfile.ZIP_DEFLATED)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.zip_file.close()
+
+    def add(self, file_path, payload):
+        name = os.path.basename(file_path)
+        # xlsx and Parquet files are compressed already, deflating them again only costs time
+        compress_type = zipfile.ZIP_DEFLATED if file_format(name) == "csv" else zipfile.ZIP_STORED
+        self.zip_file.writestr(name, payload, compress_type=compress_type)
@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import sys
+import time
+from multiprocessing import freeze_support
+from utils.app_config import state_file
+from utils.engine import Job, load_job, report_file, run_job, run_profiled
+from utils.job_queue import add_to_queue, load_queue, profile_path, queue_file, queue_summary, run_queue, save_profile, summary_file
+from utils.profiling import profiling_enabled
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m utils.cli", description="Generate WhatsApp message files without the GUI.")
+    parser.add_argument("state", nargs="?", default=state_file, help="job file in the state_data.json format (default: the GUI's last saved state)")
+    parser.add_argument("--file", dest="file_path", help="excel file to read")
+    parser.add_argument("--output", dest="output_path", help="output directory")
+    parser.add_argument("--phone", dest="phone_column", help="phone column letter")
+    parser.add_argument("--hyperlink", dest="hyperlink_column", help="hyperlink column letter")
+    parser.add_argument("--branch", dest="branch_column", help="split by the values of this column")
+    parser.add_argument("--chunk-size", dest="chunk_size", type=int, help="split into files of this many rows instead")
+    parser.add_argument("--format", dest="format_string", help="message format")
+    parser.add_argument("--workers", type=int, help="number of writer processes")
+    parser.add_argument("--no-cache", action="store_true", help="always parse the workbook again")
+    parser.add_argument("--stream", action="store_true", default=None, help="read the workbook batch by batch while generating instead of loading it whole")
+    parser.add_argument("--incremental", action="store_true", default=None, help="only rebuild files whose rows or settings changed since the last run")
+    parser.add_argument("--save-profile", metavar="NAME", help="save the job's settings (everything but the input file) as a queue profile and exit")
+    parser.add_argument("--replace", action="store_true", help="let --save-profile overwrite a profile of the same name")
+    parser.add_argument("--enqueue", metavar="PROFILE", help="add the input file to the job queue with this profile and exit")
+    parser.add_argument("--queue", nargs="?", const=queue_file, metavar="QUEUE", help=f"run every job of the queue file concurrently (default: {queue_file})")
+    parser.add_argument("--profile", action="store_true", default=profiling_enabled, help=f"time every stage and write {report_file}")
+    return parser.parse_args(argv)
+
+def read_state(path):
+    with open(path, "r") as file:
+        state_data = json.load(file)
+    if not isinstance(state_data, dict):
+        raise ValueError("expected a JSON object of job settings")
+    return state_data
+
+def main_queue(args):
+    entries = load_queue(args.queue)
+    if not entries:
+        print(f"[error]: {args.queue} has no jobs", file=sys.stderr)
+        return 1
+
+    on_status = lambda index, status: print(status.summary())
+    statuses, elapsed = run_queue(entries, args.workers, on_status)
+    print(f"[info]: {queue_summary(statuses, elapsed)}, summary saved to {summary_file}")
+    return 0 if all(status.state == "done" for status in statuses) else 1
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.queue:
+        return main_queue(args)
+    try:
+        # The overrides can fill in whatever a partial job file leaves out, so it stays a plain dict until merged
+        state_data = read_state(args.state) if os.path.exists(args.state) else {}
+    except (OSError, ValueError) as e:
+        print(f"[error]: {args.state} could not be read: {e}", file=sys.stderr)
+        return 1
+    overrides = {key: value for key, value in vars(args).items() if key in Job.__dataclass_fields__ and value is not None}
+    if args.branch_column is not None:
+        overrides["splitby_branch"] = True
+    if args.chunk_size is not None:
+        overrides["splitby_branch"] = False
+    state_data.update(overrides)
+
+    try:
+        job = Job.from_state(state_data)
+    except TypeError:
+        print(f"[error]: {args.state} is missing required settings", file=sys.stderr)
+        return 1
+    except ValueError as e:
+        print(f"[error]: {args.state} has an invalid setting: {e}", file=sys.stderr)
+        return 1
+
+    error = job.validate()
+    if error:
+        print(f"[error]: {error}", file=sys.stderr)
+        return 1
+
+    if args.save_profile:
+        try:
+            if os.path.exists(profile_path(args.save_profile)) and not args.replace:
+                raise ValueError(f"Profile {args.save_profile!r} already exists, pass --replace to overwrite it")
+            save_profile(args.save_profile, job)
+        except (OSError, ValueError) as e:
+            print(f"[error]: {e}", file=sys.stderr)
+            return 1
+        print(f"[info]: Profile {args.save_profile!r} saved")
+        return 0
+    if args.enqueue:
+        try:
+            entries = add_to_queue(job.file_path, args.enqueue)
+        except (OSError, ValueError) as e:
+            print(f"[error]: {e}", file=sys.stderr)
+            return 1
+        print(f"[info]: {job.file_path} queued with profile {args.enqueue!r} ({len(entries)} jobs in {queue_file})")
+        return 0
+
+    on_progress = lambda progress: print(f"{os.path.basename(progress.file_path)}...done! ({progress.summary()})")
+    try:
+        start = time.perf_counter()
+        data_frame, column_map, load_report = load_job(job, use_cache=not args.no_cache, streaming=args.stream)
+        load_seconds = time.perf_counter() - start
+        print(f"[info]: Successfully Loaded! {load_report}".strip())
+
+        if args.profile:
+            _, report = run_profiled(job, data_frame, column_map, load_seconds, on_progress=on_progress, workers=args.workers, incremental=args.incremental, streaming=args.stream)
+            print(f"[info]: {report.summary()}, report saved to {report_file}")
+        else:
+            run_job(job, data_frame, column_map, on_progress=on_progress, workers=args.workers, incremental=args.incremental, streaming=args.stream)
+    except Exception as e:
+        print(f"[error]: {e}", file=sys.stderr)
+        return 1
+
+    print("[info]: Successfully generated!")
+    return 0
+
+if __name__ == "__main__":
+    freeze_support()
+    sys.exit(main())
@@ -0,0 +1,264 @@
+import json
+import os
+import time
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime
+from functools import partial
+from utils import generate_hyperlink
+from utils.app_config import cache_dir, data_dir
+from utils.archive_output import ArchiveWriter, archive_file_path, archive_output, entry_buffer, save_entry
+from utils.generate_hyperlink import count_files, excel_column_index_to_letter, partition_data, partition_jobs, partition_sizes, save_output, stream_output
+from utils.load_excel import compile_loaded_template, load_excel, remap_column, unloaded_error
+from utils.manifest import load_manifest, partition_digest, remove_stale, save_manifest, settings_digest, workbook_digest
+from utils.parallel_writer import write_parallel
+from utils.phone_numbers import PhoneStage, validate_phones
+from utils.profiling import RunReport, profiled, profiler
+from utils.streaming_pipeline import PartitionSpill, stream_jobs, streaming_enabled
+from utils.workbook_output import count_workbooks, save_sheets, sheet_rows, workbook_jobs, workbook_output
+
+report_file = os.path.join(data_dir, "timing_report.json")
+profile_file = os.path.join(data_dir, "profile.prof")
+
+@dataclass
+class Job:
+    # Field names follow the keys of state_data.json
+    file_path: str
+    output_path: str
+    phone_column: str
+    hyperlink_column: str
+    format_string: str
+    branch_column: str = ""
+    chunk_size: int = 200
+    splitby_branch: bool = True
+
+    @classmethod
+    def from_state(cls, state_data):
+        job = cls(**{field.name: state_data[field.name] for field in fields(cls) if field.name in state_data})
+        job.chunk_size = int(job.chunk_size or 0)
+        job.splitby_branch = bool(job.splitby_branch)
+        return job
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, "r") as file:
+            return cls.from_state(json.load(file))
+
+    def to_state(self):
+        return asdict(self)
+
+    def validate(self):
+        if not self.output_path:
+            return "Please provde the output directory"
+        if not self.phone_column:
+            return "Please provide the phone column"
+        if not self.hyperlink_column:
+            return "Please provide the hyperlink column"
+        if self.splitby_branch and not self.branch_column:
+            return "Please provide the column for splitting by value"
+        if not self.splitby_branch and self.chunk_size <= 0:
+            return "Please provide the chunk size"
+        return None
+
+@dataclass
+class Progress:
+    files_total: int
+    rows_total: int
+    files_done: int = 0
+    files_skipped: int = 0
+    rows_done: int = 0
+    elapsed: float = 0.0
+    file_path: str = ""
+    cancelled: bool = False
+    phone_summary: str = ""
+
+    @property
+    def fraction(self):
+        return self.rows_done / self.rows_total if self.rows_total else 1.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows_done / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def eta(self):
+        rate = self.rows_per_second
+        return (self.rows_total - self.rows_done) / rate if rate else 0.0
+
+    def summary(self):
+        skipped = f" ({self.files_skipped} unchanged)" if self.files_skipped else ""
+        phones = f", {self.phone_summary}" if self.phone_summary else ""
+        return f"{self.files_done}/{self.files_total} files{skipped}, {self.rows_done:,} rows, {self.rows_per_second:,.0f} rows/s, ETA {self.eta:.0f}s{phones}"
+
+def load_job(job, use_cache=True, streaming=None):
+    branch_column = job.branch_column if job.splitby_branch else ""
+    streaming = streaming_enabled if streaming is None else streaming
+    return load_excel(job.file_path, job.format_string, job.phone_column, branch_column, cache_dir if use_cache else None, streaming)
+
+def run_job(job, data_frame, column_map=None, on_progress=None, workers=None, cancel=None, report=None, incremental=None, streaming=None, archive=None):
+    archive = archive_output if archive is None else archive
+    if streaming_enabled if streaming is None else streaming:
+        return run_streaming(job, data_frame, on_progress, cancel, report, archive)
+    workers = workers or generate_hyperlink.workers
+    incremental = generate_hyperlink.incremental if incremental is None else incremental
+    # An archive is written whole on every run, so there are no earlier files to keep
+    incremental = incremental and not archive
+    error = unloaded_error(job.file_path, job.format_string, column_map, job.phone_column, job.branch_column if job.splitby_branch else "")
+    if error:
+        raise ValueError(error)
+    branch_index = remap_column(job.branch_column, column_map, "") if job.splitby_branch else ""
+    phone_index = remap_column(job.phone_column, column_map)
+    hyperlink_index = remap_column(job.hyperlink_column, column_map, excel_column_index_to_letter(data_frame.shape[1]))
+    template = compile_loaded_template(job.format_string, data_frame, column_map)
+    created = datetime.now()
+    os.makedirs(job.output_path, exist_ok=True)
+
+    phones = PhoneStage(phone_index, branch_index) if validate_phones else None
+    if phones is not None:
+        start = time.perf_counter()
+        data_frame = phones.apply(data_frame)
+        phones.write_report(job.file_path, job.output_path, dated=not incremental)
+        if report is not None:
+            report.add_stage("phones", time.perf_counter() - start)
+
+    start = time.perf_counter()
+    partitions = partition_data(data_frame, branch_index)
+    if report is not None:
+        report.add_stage("partition", time.perf_counter() - start)
+    # Workbook output puts every partition on its own sheet of a few xlsx files
+    books = workbook_output and generate_hyperlink.output_format == "xlsx"
+    files_total = count_workbooks(partition_sizes(data_frame, partitions, job.chunk_size)) if books else count_files(data_frame, partitions, job.chunk_size)
+    progress = Progress(files_total, len(data_frame), phone_summary=phones.summary() if phones else "")
+    rows = {}
+    started = time.perf_counter()
+
+    # Incremental runs keep files whose rows and settings hash the same as last time
+    previous = load_manifest(job.output_path, job.file_path) if incremental else {}
+    settings = settings_digest(template, phone_index, hyperlink_index) if incremental else ""
+    digests = {}
+    manifest = {}
+
+    def counted(jobs):
+        while True:
+            start = time.perf_counter()
+            item = next(jobs, None)
+            if item is None:
+                return
+            if report is not None:
+                # Slicing out the partition and its column widths happens inside the generator
+                report.add_stage("filter_data", time.perf_counter() - start)
+            branch_file_path, data, _ = item
+            rows[branch_file_path] = sheet_rows(data) if books else len(data)
+
+            if incremental:
+                file_name = os.path.basename(branch_file_path)
+                digests[branch_file_path] = workbook_digest(data, settings) if books else partition_digest(data, settings)
+                if previous.get(file_name) == digests[branch_file_path] and os.path.exists(branch_file_path):
+                    progress.files_skipped += 1
+                    file_done(branch_file_path)
+                    continue
+            yield item
+
+    def file_done(branch_file_path, timings=None):
+        if report is not None and timings is not None:
+            report.add_file(branch_file_path, rows[branch_file_path], timings)
+        if incremental:
+            manifest[os.path.basename(branch_file_path)] = digests.pop(branch_file_path)
+        progress.files_done += 1
+        progress.rows_done += rows.pop(branch_file_path)
+        progress.elapsed = time.perf_counter() - started
+        progress.file_path = branch_file_path
+        if on_progress:
+            on_progress(progress)
+
+    def archived(branch_file_path, result):
+        timings, payload = result
+        archive_writer.add(branch_file_path, payload)
+        file_done(branch_file_path, timings)
+
+    jobs = counted((workbook_jobs if books else partition_jobs)(data_frame, job.file_path, job.output_path, branch_index, job.chunk_size, partitions, dated=not incremental))
+    save = save_sheets if books else save_output
+    done = file_done
+
+    with ArchiveWriter(archive_file_path(job.file_path, job.output_path)) if archive else nullcontext() as archive_writer:
+        if archive_writer is not None:
+            # Files are rendered in memory and go straight into the archive, none is written out on its own
+            save = partial(save_entry, save)
+            done = archived
+
+        if workers > 1:
+            write_parallel(jobs, phone_index, hyperlink_index, template, workers, created, done, cancel, save)
+        else:
+            for branch_file_path, data, widths in jobs:
+                if cancel is not None and cancel.is_set():
+                    break
+                done(branch_file_path, save(data, branch_file_path, phone_index, hyperlink_index, template, created, widths))
+
+    progress.cancelled = cancel is not None and cancel.is_set() and progress.files_done < progress.files_total
+    if incremental:
+        # Files a cancelled run never reached are still what the old entries describe
+        save_manifest(job.output_path, job.file_path, {**previous, **manifest} if progress.cancelled else manifest)
+        if not progress.cancelled:
+            remove_stale(job.output_path, previous, manifest)
+    return progress
+
+def counted_batches(batches, sizes):
+    for data in batches:
+        sizes.append(len(data))
+        yield data
+
+def run_streaming(job, data_frame, on_progress=None, cancel=None, report=None, archive=False):
+    # data_frame only holds the first rows here; the source file is read again batch by batch.
+    # Files are written one after another and always carry the date, incremental runs need the whole frame
+    branch_index = job.branch_column if job.splitby_branch else ""
+    hyperlink_index = job.hyperlink_column or excel_column_index_to_letter(data_frame.shape[1])
+    template = compile_loaded_template(job.format_string, data_frame, None)
+    created = datetime.now()
+    os.makedirs(job.output_path, exist_ok=True)
+
+    phones = PhoneStage(job.phone_column, branch_index) if validate_phones else None
+    archive_writer = ArchiveWriter(archive_file_path(job.file_path, job.output_path)) if archive else nullcontext()
+    with PartitionSpill() as spill, archive_writer:
+        start = time.perf_counter()
+        files_total, rows_total, jobs = stream_jobs(job.file_path, job.output_path, branch_index, data_frame.columns, spill, job.chunk_size, cancel, phones)
+        if report is not None:
+            report.add_stage("partition", time.perf_counter() - start)
+        progress = Progress(files_total, rows_total)
+        started = time.perf_counter()
+
+        for branch_file_path, batches in jobs:
+            if cancel is not None and cancel.is_set():
+                break
+            sizes = []
+            target = entry_buffer(branch_file_path) if archive else branch_file_path
+            timings = stream_output(counted_batches(batches, sizes), data_frame.columns, target, job.phone_column, hyperlink_index, template, created)
+            if archive:
+                archive_writer.add(branch_file_path, target.getvalue())
+            if report is not None:
+                report.add_file(branch_file_path, sum(sizes), timings)
+            progress.files_done += 1
+            progress.files_total = max(progress.files_total, progress.files_done)
+            progress.rows_done += sum(sizes)
+            progress.rows_total = max(progress.rows_total, progress.rows_done)
+            progress.elapsed = time.perf_counter() - started
+            progress.file_path = branch_file_path
+            if on_progress:
+                on_progress(progress)
+
+    progress.cancelled = cancel is not None and cancel.is_set()
+    if phones is not None:
+        # In chunk mode the last rows are only checked once the last file is written
+        phones.write_report(job.file_path, job.output_path)
+        progress.phone_summary = phones.summary()
+    return progress
+
+def run_profiled(job, data_frame, column_map=None, load_seconds=None, **kwargs):
+    report = RunReport(job)
+    if load_seconds is not None:
+        report.add_stage("read_excel", load_seconds)
+
+    os.makedirs(data_dir, exist_ok=True)
+    with profiled(report, profiler, profile_file):
+        progress = run_job(job, data_frame, column_map, report=report, **kwargs)
+    report.write(report_file)
+    return progress, report
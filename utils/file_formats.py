@@ -0,0 +1,171 @@
+import os
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet support is optional
+    pa = pq = None
+
+# Header of the link column when the hyperlink column is past the last data column
+link_header = "WhatsApp Link"
+
+def file_format(file_path):
+    # In-memory buffers carry the file name they stand in for
+    extension = os.path.splitext(getattr(file_path, "name", file_path))[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension == ".parquet":
+        return "parquet"
+    return "excel"
+
+def require_pyarrow():
+    if pq is None:
+        raise ImportError("Parquet files need the pyarrow package (pip install pyarrow)")
+
+def parquet_file(file_path):
+    require_pyarrow()
+    return pq.ParquetFile(file_path)
+
+def read_header(file_path):
+    kind = file_format(file_path)
+    if kind == "csv":
+        return pd.read_csv(file_path, nrows=0).columns
+    if kind == "parquet":
+        return pd.Index(parquet_file(file_path).schema_arrow.names)
+    return pd.read_excel(file_path, nrows=0).columns
+
+def read_table(file_path, usecols=None, nrows=None):
+    # usecols holds column positions, like read_excel's
+    kind = file_format(file_path)
+    if kind == "csv":
+        return pd.read_csv(file_path, usecols=usecols, nrows=nrows)
+    if kind == "parquet":
+        parquet = parquet_file(file_path)
+        # Parquet is columnar, so only the projected columns are read from disk
+        columns = None if usecols is None else [parquet.schema_arrow.names[i] for i in usecols]
+        if nrows is None:
+            return parquet.read(columns=columns).to_pandas()
+        batch = next(parquet.iter_batches(batch_size=nrows, columns=columns), None)
+        return pd.DataFrame(columns=columns or parquet.schema_arrow.names) if batch is None else batch.to_pandas()
+    return pd.read_excel(file_path, usecols=usecols, nrows=nrows)
+
+def count_rows(file_path):
+    kind = file_format(file_path)
+    if kind == "csv":
+        return 0
+    if kind == "parquet":
+        return parquet_file(file_path).metadata.num_rows
+    workbook = load_workbook(file_path, read_only=True)
+    try:
+        # Taken from the sheet's dimension tag, so nothing is read yet (0 when the tag is missing)
+        return max((workbook.active.max_row or 1) - 1, 0)
+    finally:
+        workbook.close()
+
+def read_batches(file_path, columns, size):
+    kind = file_format(file_path)
+    if kind == "csv":
+        yield from pd.read_csv(file_path, chunksize=size)
+        return
+    if kind == "parquet":
+        for batch in parquet_file(file_path).iter_batches(batch_size=size):
+            yield batch.to_pandas()
+        return
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(min_row=2, values_only=True)
+        batch = []
+        for row in rows:
+            # read_excel skips blank rows too
+            if all(value is None for value in row):
+                continue
+            batch.append(row[:len(columns)])
+            if len(batch) == size:
+                yield to_frame(batch, columns)
+                batch = []
+        if batch:
+            yield to_frame(batch, columns)
+    finally:
+        workbook.close()
+
+def to_frame(batch, columns):
+    data_frame = pd.DataFrame(batch, columns=range(len(columns)))
+    data_frame.columns = columns
+    # Blank cells become NaN like in read_excel, so they render and split as "nan" in both modes
+    return data_frame.where(data_frame.notna(), np.nan)
+
+def with_links(data, urls, hyperlink_col):
+    # The link replaces the hyperlink column like the formula does in xlsx output, or is appended after the data
+    if hyperlink_col < data.shape[1]:
+        data = data.copy()
+        data.isetitem(hyperlink_col, urls.to_numpy())
+        return data
+    return data.assign(**{link_header: urls.to_numpy()})
+
+def parquet_table(data):
+    # Excel columns often mix numbers and text, which Arrow can't store in one column
+    data = data.copy()
+    for col_index in range(data.shape[1]):
+        column = data.iloc[:, col_index]
+        if column.dtype == object:
+            data.isetitem(col_index, column.where(column.isna(), column.astype(str)))
+    return pa.Table.from_pandas(data, preserve_index=False)
+
+def has_null_fields(schema):
+    return any(pa.types.is_null(field.type) for field in schema)
+
+class TableWriter:
+    # Appends batches to one CSV or Parquet file
+    def __init__(self, file_path, held_rows=100000):
+        self.file_path = file_path
+        self.kind = file_format(file_path)
+        self.parquet_writer = None
+        self.held = []
+        self.held_rows = held_rows
+        self.rows = 0
+        if self.kind == "parquet":
+            require_pyarrow()
+
+    def write(self, data):
+        if self.kind == "csv":
+            data.to_csv(self.file_path, mode="a" if self.rows else "w", header=not self.rows, index=False)
+        else:
+            self.held.append(parquet_table(data))
+            # A Parquet file's schema is fixed when it is opened, and a column that is blank in every batch so far
+            # has no type yet; those batches wait (up to held_rows) for one that shows the column's type
+            if self.parquet_writer is not None or not has_null_fields(self.held_schema()) or sum(map(len, self.held)) >= self.held_rows:
+                self.flush()
+        self.rows += len(data)
+
+    def held_schema(self):
+        # Also widens columns that are int in one batch and float (int with blanks) in another
+        return pa.unify_schemas([table.schema for table in self.held], promote_options="permissive")
+
+    def flush(self):
+        if not self.held:
+            return
+        if self.parquet_writer is None:
+            schema = self.held_schema()
+            # Columns blank all along are stored as text, which any later value can be cast to
+            schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in schema], schema.metadata)
+            self.parquet_writer = pq.ParquetWriter(self.file_path, schema)
+        for table in self.held:
+            self.parquet_writer.write_table(table.cast(self.parquet_writer.schema))
+        self.held = []
+
+    def close(self):
+        if self.kind == "parquet":
+            self.flush()
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+
+def write_table(data, file_path):
+    writer = TableWriter(file_path)
+    try:
+        writer.write(data)
+    finally:
+        writer.close()
@@ -1,13 +1,34 @@
 import pandas as pd
-from datetime import datetime
+import numpy as np
+import xlsxwriter
+from datetime import date, datetime
+from urllib.parse import quote
 import os
-import configparser
+import time
+from utils.app_config import config
+from utils.file_formats import TableWriter, file_format, read_table, with_links, write_table
 
-config = configparser.ConfigParser()
-config.read('config.ini')
 country_code = config.get('whatsapp', 'COUNTRY_CODE').strip()
 phone_number_len = config.get('whatsapp', 'PHONE_NUMBER_LEN').strip()
 anchor_text = config.get('whatsapp', 'ANCHOR_TEXT').strip()
+workers = config.getint('generation', 'WORKERS', fallback=1) or os.cpu_count()
+streaming_rows = config.getint('generation', 'STREAMING_ROWS', fallback=0)
+link_mode = config.get('generation', 'LINK_MODE', fallback='formula').strip().lower()
+width_sample_rows = config.getint('generation', 'WIDTH_SAMPLE_ROWS', fallback=0)
+fixed_column_width = config.getint('generation', 'FIXED_COLUMN_WIDTH', fallback=0)
+incremental = config.getboolean('generation', 'INCREMENTAL', fallback=False)
+output_format = config.get('generation', 'OUTPUT_FORMAT', fallback='xlsx').strip().lower()
+
+# Stands in for the row number in compiled formulas (a "#" could clash with message text)
+row_marker = "\0"
+excel_epoch = pd.Timestamp(1899, 12, 30)
+
+# Excel refuses longer hyperlinks and stops linking after this many per worksheet
+max_url_length = 2079
+max_urls = 65530
+
+# Rows below the header that fit on one worksheet
+max_sheet_rows = 1048575
 
 def excel_column_letter_to_index(col_letter):
     col_letter = col_letter.upper()
@@ -16,12 +37,44 @@ def excel_column_letter_to_index(col_letter):
         num = num * 26 + (ord(col_letter[i]) - ord("A") + 1)
     return num - 1
 
+def excel_column_index_to_letter(col_index):
+    col_letter = ""
+    col_index += 1
+    while col_index > 0:
+        col_index, remainder = divmod(col_index - 1, 26)
+        col_letter = chr(ord("A") + remainder) + col_letter
+    return col_letter
+
 def load_data(file_path):
-    return pd.read_excel(file_path)
+    return read_table(file_path)
+
+def partition_data(data_frame, branch_index):
+    # Normalize the split column once and group row positions in a single pass
+    if branch_index == None or excel_column_letter_to_index(branch_index) <= -1:
+        return None
+    column = data_frame.iloc[:, excel_column_letter_to_index(branch_index)]
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # Strip each category once; code -1 (blank) picks the trailing "nan" just like astype(str)
+        names = np.append(column.cat.categories.astype(str).str.strip(), "nan")
+        keys = pd.Series(names[column.cat.codes.to_numpy()], index=column.index)
+    else:
+        keys = column.astype(str).str.strip()
+    return keys.groupby(keys, sort=False).indices
+
+def split_keys(column):
+    # Batches read one at a time: a blank cell turns one batch's column float while the next reads as int,
+    # so integral floats are keyed like ints and every batch puts the same value under the same key
+    keys = column.astype(str)
+    if pd.api.types.is_float_dtype(column):
+        integral = column.notna() & (column % 1 == 0)
+        keys[integral] = column[integral].astype("int64").astype(str)
+    return keys.str.strip()
 
-def filter_data(data_frame, branch_name, branch_index):
+def filter_data(data_frame, branch_name, branch_index, partitions=None):
     if branch_index == None or excel_column_letter_to_index(branch_index) <= -1:
         return data_frame.copy(), True
+    elif partitions is not None:
+        return data_frame.take(partitions.get(branch_name, [])), False
     else:
         return data_frame[data_frame.iloc[:, excel_column_letter_to_index(branch_index)].astype(str).str.strip() == branch_name].copy(), False
 
@@ -30,43 +83,367 @@ def write_to_excel(branch_data, branch_file_path):
     branch_data.to_excel(writer, sheet_name='Sheet1', index=False)
     return writer
 
-def add_hyperlink_formula(worksheet, branch_data, mob_index, hyperlink_index, msg_index):
+def compile_hyperlink_formula(mob_index, msg_index):
+    # Split once around the row marker so each row costs a single join
+    formula = f'=HYPERLINK("https://wa.me/"& IF(LEN({mob_index}{row_marker})={phone_number_len},"{country_code}"&{mob_index}{row_marker},{mob_index}{row_marker})&"?text="&TRIM(CONCATENATE({msg_index})),"{anchor_text}")'
+    return formula.split(row_marker)
+
+def add_hyperlink_formula(worksheet, branch_data, mob_index, hyperlink_index, template):
+    formula_parts = compile_hyperlink_formula(mob_index, template.msg_index)
     for row_index in range(2, len(branch_data) + 2):
-        msg_index__ = msg_index.replace('#', str(row_index))
-        hyperlink_formula = f'=HYPERLINK("https://wa.me/"& IF(LEN({mob_index}{row_index})={phone_number_len},"{country_code}"&{mob_index}{row_index},{mob_index}{row_index})&"?text="&TRIM(CONCATENATE({msg_index__})),"{anchor_text}")'
-        worksheet.write_formula(f'{hyperlink_index}{row_index}', hyperlink_formula)
+        worksheet.write_formula(f'{hyperlink_index}{row_index}', str(row_index).join(formula_parts))
+
+def format_numbers(values):
+    # Excel's "General" format shows up to 15 significant digits
+    return pd.Series(np.char.mod("%.15g", values.to_numpy(dtype=float, na_value=np.nan)), index=values.index)
+
+def render_values(column):
+    if pd.api.types.is_bool_dtype(column):
+        return column.map({True: "TRUE", False: "FALSE"})
+    if pd.api.types.is_datetime64_any_dtype(column):
+        # Concatenating a date cell in Excel yields its serial number
+        return format_numbers((column - excel_epoch) / pd.Timedelta(days=1))
+    if pd.api.types.is_numeric_dtype(column):
+        return format_numbers(column)
+    return column.astype(str)
+
+def format_dates(column):
+    # Dates repeat a lot, so each distinct day is formatted once and spread back over the rows
+    codes, uniques = pd.factorize(column)
+    text = np.append(np.asarray(pd.DatetimeIndex(uniques).strftime("%d-%m-%Y"), dtype=object), np.nan)
+    return pd.Series(text[codes], index=column.index)
+
+def render_dates(column):
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return format_dates(column)
+    if pd.api.types.is_numeric_dtype(column):
+        return format_dates(excel_epoch + pd.to_timedelta(column.fillna(0).astype(int), unit="D"))
+    # Text columns, like every date read from CSV: ISO dates are formatted as date cells are (Excel's TEXT
+    # does the same), other values stay as they are. Each distinct value is looked at once
+    codes, uniques = pd.factorize(column)
+    values = pd.Series(uniques, dtype=object)
+    parsed = pd.to_datetime(values.where(values.map(type).eq(str)), format="ISO8601", errors="coerce")
+    text = values.map(lambda value: value.strftime("%d-%m-%Y") if isinstance(value, datetime) else str(value))
+    text = text.where(parsed.isna(), parsed.dt.strftime("%d-%m-%Y"))
+    return pd.Series(np.append(text.to_numpy(dtype=object), np.nan)[codes], index=column.index)
+
+def render_messages(data, tokens):
+    message = pd.Series("", index=data.index, dtype=object)
+    for kind, value in tokens:
+        if kind == "text":
+            message += value
+            continue
+        column = data.iloc[:, excel_column_letter_to_index(value)]
+        text = render_dates(column) if kind == "date" else render_values(column)
+        # Like the formulas: SUBSTITUTE of a blank cell is "", the other placeholders show N/A
+        message += text.where(column.notna(), "" if kind == "ampr" else "N/A")
+    # Same as Excel's TRIM: drop outer spaces and collapse runs of spaces. Most messages have no runs,
+    # so the regex only sees the ones that do
+    spaced = message.str.contains("  ", regex=False).to_numpy(dtype=bool)
+    if spaced.any():
+        message[spaced] = message[spaced].str.replace(r" {2,}", " ", regex=True)
+    return message.str.strip(" ")
+
+def render_phones(data, mob_index):
+    column = data.iloc[:, excel_column_letter_to_index(mob_index)]
+    phone = render_values(column).where(column.notna(), "")
+    return phone.where(phone.str.len() != int(phone_number_len), country_code + phone)
+
+def render_urls(data, mob_index, tokens):
+    messages = render_messages(data, tokens).map(lambda message: quote(message, safe=""))
+    return "https://wa.me/" + render_phones(data, mob_index) + "?text=" + messages
+
+def write_link(worksheet, row, col, url, links_written):
+    if len(url) <= max_url_length and links_written < max_urls:
+        worksheet.write_url(row, col, url, string=anchor_text)
+        return True
+    worksheet.write_string(row, col, url)
+    return False
+
+def add_hyperlink_urls(worksheet, urls, hyperlink_index):
+    hyperlink_col = excel_column_letter_to_index(hyperlink_index)
+    links_written = 0
+    for row_index, url in enumerate(urls, start=1):
+        links_written += write_link(worksheet, row_index, hyperlink_col, url, links_written)
+
+def column_lengths(column):
+    # One vectorized pass; uint8 is enough since widths are capped at 255
+    return column.astype(str).str.len().clip(upper=255).to_numpy(dtype=np.uint8)
+
+def sample_rows(groups):
+    # None means every row, in which case the frame isn't reordered or copied at all
+    if not width_sample_rows or all(len(rows) <= width_sample_rows for rows in groups):
+        return None
+    # Huge partitions are sized from evenly spaced rows instead of every row
+    return np.concatenate([rows if len(rows) <= width_sample_rows else rows[np.linspace(0, len(rows) - 1, width_sample_rows).astype(int)] for rows in groups])
+
+def partition_widths(data_frame, partitions, chunk_size=200):
+    if fixed_column_width or output_format != "xlsx" or data_frame.empty or data_frame.shape[1] == 0:
+        return None
+
+    count = len(data_frame)
+    chunk_size = file_chunk_size(chunk_size)
+    if partitions is not None:
+        groups = list(partitions.values())
+        codes = np.empty(count, dtype=np.int64)
+        for code, rows in enumerate(groups):
+            codes[rows] = code
+    else:
+        groups = [np.arange(start, min(start + chunk_size, count)) for start in range(0, count, chunk_size)]
+        codes = np.arange(count) // chunk_size
+
+    # Lengths are measured one column at a time in the frame's own row order and grouped by code,
+    # so no reordered copy of the whole frame is made; only sampled rows are taken out
+    rows = sample_rows(groups)
+    keys = codes if rows is None else codes[rows]
+    maxima = np.zeros((len(groups), data_frame.shape[1]), dtype=np.uint8)
+    for col_index in range(data_frame.shape[1]):
+        column = data_frame.iloc[:, col_index]
+        lengths = column_lengths(column if rows is None else column.take(rows))
+        maxima[:, col_index] = pd.Series(lengths).groupby(keys).max().reindex(range(len(groups)), fill_value=0).to_numpy()
+    header = np.array([min(len(str(col_name)), 255) for col_name in data_frame.columns])
+    return np.maximum(maxima, header).tolist()
+
+def adjust_column_width(worksheet, branch_data, widths=None):
+    if fixed_column_width:
+        worksheet.set_column(0, max(branch_data.shape[1] - 1, 0), fixed_column_width)
+        return
+
+    if widths is not None:
+        for col_index, max_length in enumerate(widths):
+            worksheet.set_column(col_index, col_index, max_length)
+        return
 
-def adjust_column_width(worksheet, branch_data):
     for col_index, col_name in enumerate(branch_data.columns):
         max_length = max(branch_data[col_name].astype(str).apply(len).max(), len(str(col_name)))  # Calculate max length of column
         max_length = min(max_length, 255)  # Max width is 255 characters
         worksheet.set_column(col_index, col_index, max_length)
 
-def save_to_excel(data, file_path, mob_index, hyperlink_index, msg_index):
+def write_cell(worksheet, row, col, value, cell_formats):
+    # Mirror how pandas' to_excel writes values so both save paths produce the same sheet
+    if value is None or value is pd.NaT or value is pd.NA or (isinstance(value, float) and np.isnan(value)):
+        return
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, datetime):
+        worksheet.write_datetime(row, col, value, cell_formats["datetime"])
+    elif isinstance(value, date):
+        worksheet.write_datetime(row, col, value, cell_formats["date"])
+    else:
+        worksheet.write(row, col, value)
+
+def lap(timings, stage, start):
+    now = time.perf_counter()
+    timings[stage] = timings.get(stage, 0.0) + now - start
+    return now
+
+def open_stream_workbook(file_path, columns, created=None):
+    # constant_memory flushes every finished row to disk, so rows must be written strictly in order
+    workbook = xlsxwriter.Workbook(file_path, {"constant_memory": True})
+    if created is not None:
+        workbook.set_properties({"created": created})
+    worksheet = workbook.add_worksheet("Sheet1")
+    header_format = workbook.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+    cell_formats = {
+        "datetime": workbook.add_format({"num_format": "YYYY-MM-DD HH:MM:SS"}),
+        "date": workbook.add_format({"num_format": "YYYY-MM-DD"}),
+    }
+    for col_index, col_name in enumerate(columns):
+        worksheet.write(0, col_index, col_name, header_format)
+    return workbook, worksheet, cell_formats
+
+def stream_rows(worksheet, data, first_row, hyperlink_col, formula_parts, urls, links_written, cell_formats):
+    for row_index, row in enumerate(data.itertuples(index=False, name=None), start=first_row):
+        for col_index, value in enumerate(row):
+            write_cell(worksheet, row_index, col_index, value, cell_formats)
+        if urls is not None:
+            links_written += write_link(worksheet, row_index, hyperlink_col, urls.iat[row_index - first_row], links_written)
+        else:
+            worksheet.write_formula(row_index, hyperlink_col, str(row_index + 1).join(formula_parts))
+    return links_written
+
+def stream_to_excel(data, file_path, mob_index, hyperlink_index, template, created=None, urls=None, widths=None, timings=None):
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+    workbook, worksheet, cell_formats = open_stream_workbook(file_path, data.columns, created)
+    adjust_column_width(worksheet, data, widths)
+    start = lap(timings, "adjust_column_width", start)
+
+    formula_parts = compile_hyperlink_formula(mob_index, template.msg_index)
+    stream_rows(worksheet, data, 1, excel_column_letter_to_index(hyperlink_index), formula_parts, urls, 0, cell_formats)
+    start = lap(timings, "write_rows", start)
+
+    workbook.close()
+    lap(timings, "save", start)
+    return timings
+
+def stream_batches_to_excel(batches, columns, file_path, mob_index, hyperlink_index, template, created=None):
+    # Like stream_to_excel, but the rows arrive in pieces and only one piece is held at a time
+    timings = {}
+    start = time.perf_counter()
+    workbook, worksheet, cell_formats = open_stream_workbook(file_path, columns, created)
+    hyperlink_col = excel_column_letter_to_index(hyperlink_index)
+    formula_parts = compile_hyperlink_formula(mob_index, template.msg_index)
+    widths = np.array([min(len(str(col_name)), 255) for col_name in columns])
+    row_index = 1
+    links_written = 0
+    start = lap(timings, "write_rows", start)
+
+    for data in batches:
+        start = lap(timings, "read_rows", start)
+        urls = None
+        if link_mode == "url":
+            urls = render_urls(data, mob_index, template.tokens)
+            start = lap(timings, "render_urls", start)
+        links_written = stream_rows(worksheet, data, row_index, hyperlink_col, formula_parts, urls, links_written, cell_formats)
+        row_index += len(data)
+        start = lap(timings, "write_rows", start)
+        if not fixed_column_width and len(data) and len(columns):
+            widths = np.maximum(widths, [column_lengths(data.iloc[:, col_index]).max() for col_index in range(data.shape[1])])
+            start = lap(timings, "adjust_column_width", start)
+
+    # Column widths can still be set here, constant_memory only writes them out on close
+    adjust_column_width(worksheet, pd.DataFrame(columns=columns), widths.tolist())
+    start = lap(timings, "adjust_column_width", start)
+    workbook.close()
+    lap(timings, "save", start)
+    return timings
+
+def save_to_excel(data, file_path, mob_index, hyperlink_index, template, created=None, widths=None):
+    # Returns seconds spent per stage, for the run timing report
+    timings = {}
+    start = time.perf_counter()
+    urls = None
+    if link_mode == "url":
+        urls = render_urls(data, mob_index, template.tokens)
+        start = lap(timings, "render_urls", start)
+
+    if streaming_rows and len(data) >= streaming_rows:
+        return stream_to_excel(data, file_path, mob_index, hyperlink_index, template, created, urls, widths, timings)
+
     writer = write_to_excel(data, file_path)
+    if created is not None:
+        # Pin the document timestamp so files from the same run are reproducible
+        writer.book.set_properties({"created": created})
+    start = lap(timings, "to_excel", start)
     worksheet = writer.sheets['Sheet1']
-    add_hyperlink_formula(worksheet, data, mob_index, hyperlink_index, msg_index)
-    adjust_column_width(worksheet, data)
+    if urls is not None:
+        add_hyperlink_urls(worksheet, urls, hyperlink_index)
+    else:
+        add_hyperlink_formula(worksheet, data, mob_index, hyperlink_index, template)
+    start = lap(timings, "add_hyperlink_formula", start)
+    adjust_column_width(worksheet, data, widths)
+    start = lap(timings, "adjust_column_width", start)
     writer._save()
+    lap(timings, "save", start)
+    return timings
+
+def save_output(data, file_path, mob_index, hyperlink_index, template, created=None, widths=None):
+    if file_format(file_path) == "excel":
+        return save_to_excel(data, file_path, mob_index, hyperlink_index, template, created, widths)
+
+    # CSV and Parquet can't hold formulas, so they always get the finished links
+    timings = {}
+    start = time.perf_counter()
+    urls = render_urls(data, mob_index, template.tokens)
+    start = lap(timings, "render_urls", start)
+    write_table(with_links(data, urls, excel_column_letter_to_index(hyperlink_index)), file_path)
+    lap(timings, "save", start)
+    return timings
 
-def generate_file_path(branch_name, file_path, output_path, i, no_branch_col):
+def stream_output(batches, columns, file_path, mob_index, hyperlink_index, template, created=None):
+    if file_format(file_path) == "excel":
+        return stream_batches_to_excel(batches, columns, file_path, mob_index, hyperlink_index, template, created)
+
+    timings = {}
+    start = time.perf_counter()
+    hyperlink_col = excel_column_letter_to_index(hyperlink_index)
+    writer = TableWriter(file_path)
+    try:
+        for data in batches:
+            start = lap(timings, "read_rows", start)
+            urls = render_urls(data, mob_index, template.tokens)
+            start = lap(timings, "render_urls", start)
+            writer.write(with_links(data, urls, hyperlink_col))
+            start = lap(timings, "save", start)
+    finally:
+        writer.close()
+    lap(timings, "save", start)
+    return timings
+
+def generate_file_path(branch_name, file_path, output_path, i, no_branch_col, dated=True):
     base_name = os.path.splitext(os.path.basename(file_path))[0]
-    file_name = f"{'_ALL_' if no_branch_col else branch_name}_{i+1 if no_branch_col else ''}__[{base_name}]_{datetime.now().strftime("%d-%m-%Y")}.xlsx"
+    # Incremental runs need the same name every day to find the previous file
+    date_suffix = f"_{datetime.now().strftime('%d-%m-%Y')}" if dated else ""
+    file_name = f"{'_ALL_' if no_branch_col else branch_name}_{i+1 if no_branch_col else ''}__[{base_name}]{date_suffix}.{output_format}"
     return os.path.join(output_path, file_name)
 
-def process_branch_data(data_frame, branch_name, file_path, output_path, branch_index, mob_index, hyperlink_index, msg_index, chunk_size=200):
-    branch_data, no_branch_col = filter_data(data_frame, branch_name, branch_index)
+def file_chunk_size(chunk_size):
+    # CSV and Parquet have no row limit, xlsx chunks are capped at what one sheet holds
+    return min(chunk_size, max_sheet_rows) if output_format == "xlsx" else chunk_size
+
+def part_sizes(rows):
+    # Rows of each file a split value is written to; only values too large for one sheet get several
+    if output_format != "xlsx" or rows <= max_sheet_rows:
+        return [rows]
+    return [min(max_sheet_rows, rows - start) for start in range(0, rows, max_sheet_rows)]
+
+def part_name(branch_name, part):
+    return f"{branch_name} ({part+1})"
+
+def branch_slices(branch_data, branch_name, no_branch_col, chunk_size=200, widths=None):
     if no_branch_col:
+        chunk_size = file_chunk_size(chunk_size)
         print(f"Chunking data for branches by {chunk_size} rows per file...")
-        chunks = [branch_data[i:i+chunk_size] for i in range(0, branch_data.shape[0], chunk_size)]
-        for i, chunk in enumerate(chunks):
-            branch_file_path = generate_file_path(branch_name, file_path, output_path, i, no_branch_col)
-            save_to_excel(chunk, branch_file_path, mob_index, hyperlink_index, msg_index)
-        return True
+        for i, start in enumerate(range(0, branch_data.shape[0], chunk_size)):
+            yield branch_name, i, no_branch_col, branch_data[start:start+chunk_size], widths[i] if widths else None
+    elif len(part_sizes(len(branch_data))) > 1:
+        print(f"Splitting {branch_name} into files of {max_sheet_rows} rows to fit on a sheet...")
+        for part, start in enumerate(range(0, branch_data.shape[0], max_sheet_rows)):
+            yield part_name(branch_name, part), 0, no_branch_col, branch_data[start:start+max_sheet_rows], widths
     else:
-        branch_file_path = generate_file_path(branch_name, file_path, output_path, 0, no_branch_col)
-        save_to_excel(branch_data, branch_file_path, mob_index, hyperlink_index, msg_index)
-        return False
+        yield branch_name, 0, no_branch_col, branch_data, widths
+
+def branch_jobs(branch_data, branch_name, file_path, output_path, no_branch_col, chunk_size=200, widths=None, dated=True):
+    for branch_name, i, no_branch_col, data, widths in branch_slices(branch_data, branch_name, no_branch_col, chunk_size, widths):
+        yield generate_file_path(branch_name, file_path, output_path, i, no_branch_col, dated), data, widths
+
+def count_files(data_frame, partitions, chunk_size=200):
+    if partitions is not None:
+        return sum(len(part_sizes(len(rows))) for rows in partitions.values())
+    return -(-len(data_frame) // file_chunk_size(chunk_size))
+
+def partition_sizes(data_frame, partitions, chunk_size=200):
+    # Rows of every output file, in the order they are written
+    if partitions is not None:
+        return [size for rows in partitions.values() for size in part_sizes(len(rows))]
+    chunk_size = file_chunk_size(chunk_size)
+    return [min(chunk_size, len(data_frame) - start) for start in range(0, len(data_frame), chunk_size)]
+
+def partition_slices(data_frame, branch_index, chunk_size=200, partitions=None):
+    # Yields (branch_name, i, no_branch_col, data, widths) for every output file
+    if partitions is None:
+        partitions = partition_data(data_frame, branch_index)
+    widths = partition_widths(data_frame, partitions, chunk_size)
+
+    if partitions is None:
+        branch_data, no_branch_col = filter_data(data_frame, "", branch_index)
+        yield from branch_slices(branch_data, "", no_branch_col, chunk_size, widths)
+        return
+
+    for code, branch_name in enumerate(partitions):
+        branch_data, no_branch_col = filter_data(data_frame, branch_name, branch_index, partitions)
+        yield from branch_slices(branch_data, branch_name, no_branch_col, chunk_size, widths[code] if widths else None)
+
+def partition_jobs(data_frame, file_path, output_path, branch_index, chunk_size=200, partitions=None, dated=True):
+    for branch_name, i, no_branch_col, data, widths in partition_slices(data_frame, branch_index, chunk_size, partitions):
+        yield generate_file_path(branch_name, file_path, output_path, i, no_branch_col, dated), data, widths
+
+def process_branch_data(data_frame, branch_name, file_path, output_path, branch_index, mob_index, hyperlink_index, template, chunk_size=200, partitions=None, created=None):
+    branch_data, no_branch_col = filter_data(data_frame, branch_name, branch_index, partitions)
+    for branch_file_path, data, widths in branch_jobs(branch_data, branch_name, file_path, output_path, no_branch_col, chunk_size):
+        save_output(data, branch_file_path, mob_index, hyperlink_index, template, created, widths)
+    return no_branch_col
 
 if __name__ == "__main__":
     pass
@@ -84,9 +461,9 @@ if __name__ == "__main__":
     #     "51E", "51F", "52B", "52D", "53B"
     # ]
 
-    # msg_index = 'C# ,D# ,E#, F#, G#,' # Alphabate must be at first followed by Number
+    # template = compile_template('C " " D " " E " " F " " G', data_frame.shape[1]) # from utils.message_template
     # for branch_name in branch_names:
-    #     no_branch_col = process_branch_data(data_frame, branch_name, file_path,  output_path, branch_index, mob_index, hyperlink_index, msg_index[:-1], chunk_size=1000)
+    #     no_branch_col = process_branch_data(data_frame, branch_name, file_path,  output_path, branch_index, mob_index, hyperlink_index, template, chunk_size=1000)
     #     if no_branch_col:
     #         break
     
\ No newline at end of file
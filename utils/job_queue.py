@@ -0,0 +1,227 @@
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from multiprocessing import Manager
+from utils.engine import Job, data_dir, load_job, run_job
+from utils.generate_hyperlink import config
+
+queue_workers = config.getint('queue', 'WORKERS', fallback=2) or os.cpu_count()
+
+profile_dir = os.path.join(data_dir, "profiles")
+queue_file = os.path.join(data_dir, "queue.json")
+summary_file = os.path.join(data_dir, "queue_summary.json")
+
+def profile_path(name):
+    # Names can come from the team server's clients, so they must stay inside the profile folder
+    if not name or name.strip(".") == "" or any(separator in name for separator in ("/", "\\", os.sep)):
+        raise ValueError(f"Invalid profile name {name!r}")
+    return os.path.join(profile_dir, f"{name}.json")
+
+def list_profiles():
+    if not os.path.isdir(profile_dir):
+        return []
+    return sorted(os.path.splitext(name)[0] for name in os.listdir(profile_dir) if name.endswith(".json"))
+
+def free_profile_name(name, file_path, path=queue_file):
+    # The profile the file is already queued with is reused, any other profile of that name is left alone
+    queued = {entry.get("profile") for entry in load_queue(path) if entry["file_path"] == file_path}
+    candidate, number = name, 1
+    while os.path.exists(profile_path(candidate)) and candidate not in queued:
+        number += 1
+        candidate = f"{name} ({number})"
+    return candidate
+
+def save_profile(name, job):
+    # A profile is a job without its input file, so one template and column layout serves every day's export
+    state = job.to_state()
+    state.pop("file_path")
+    os.makedirs(profile_dir, exist_ok=True)
+    with open(profile_path(name), "w") as file:
+        json.dump(state, file, indent=2)
+
+def load_profile(name):
+    with open(profile_path(name), "r") as file:
+        return json.load(file)
+
+def queue_job(entry):
+    # Settings in the entry itself win over the ones from its profile
+    state = load_profile(entry["profile"]) if entry.get("profile") else {}
+    state.update({key: value for key, value in entry.items() if key != "profile"})
+    return Job.from_state(state)
+
+def load_queue(path=queue_file):
+    try:
+        with open(path, "r") as file:
+            return json.load(file).get("jobs", [])
+    except FileNotFoundError:
+        return []
+
+def save_queue(entries, path=queue_file):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump({"jobs": entries}, file, indent=2)
+
+def output_key(job):
+    # Output files are named after the input's base name, so two inputs of the same name can't share a folder
+    base_name = os.path.splitext(os.path.basename(job.file_path))[0]
+    return os.path.normcase(os.path.abspath(job.output_path)), base_name.lower()
+
+def output_conflict(job, jobs):
+    for other in jobs:
+        if other is not None and other is not job and output_key(other) == output_key(job):
+            return f"{job.file_path} would overwrite the files of {other.file_path} in {job.output_path}, use another output folder"
+    return None
+
+def queued_jobs(entries):
+    # Entries whose profile can't be read are skipped, running them reports why
+    jobs = []
+    for entry in entries:
+        try:
+            jobs.append(queue_job(entry))
+        except (OSError, TypeError, ValueError):
+            pass
+    return jobs
+
+def queue_conflict(job, path=queue_file):
+    others = [entry for entry in load_queue(path) if entry["file_path"] != job.file_path]
+    return output_conflict(job, queued_jobs(others))
+
+def add_to_queue(file_path, profile, path=queue_file):
+    profile_path(profile)
+    entries = [entry for entry in load_queue(path) if entry["file_path"] != file_path]
+    entry = {"file_path": file_path, "profile": profile}
+    jobs = queued_jobs([entry])
+    error = queue_conflict(jobs[0], path) if jobs else None
+    if error:
+        raise ValueError(error)
+    entries.append(entry)
+    save_queue(entries, path)
+    return entries
+
+@dataclass
+class JobStatus:
+    file_path: str
+    profile: str = ""
+    state: str = "queued"
+    files: int = 0
+    rows: int = 0
+    load_seconds: float = 0.0
+    seconds: float = 0.0
+    detail: str = ""
+
+    def summary(self):
+        name = os.path.basename(self.file_path)
+        if self.state in ("queued", "running"):
+            return f"{name}: {self.state}"
+        if self.state == "failed":
+            return f"{name}: failed, {self.detail}"
+        detail = f", {self.detail}" if self.detail else ""
+        return f"{name}: {self.state}, {self.files} files, {self.rows:,} rows in {self.seconds:.1f}s (read {self.load_seconds:.1f}s){detail}"
+
+def run_queued(job, index, started, cancel=None, archive=None):
+    # Runs in a worker process, so one job's read overlaps other jobs' writes
+    started[index] = True
+    start = time.perf_counter()
+    data_frame, column_map, _ = load_job(job)
+    load_seconds = time.perf_counter() - start
+    progress = run_job(job, data_frame, column_map, workers=1, cancel=cancel, archive=archive)
+    return progress, load_seconds, time.perf_counter() - start
+
+def finish_status(status, future):
+    if future.cancelled():
+        status.state = "cancelled"
+        return
+    try:
+        progress, status.load_seconds, status.seconds = future.result()
+    except Exception as e:
+        status.state = "failed"
+        status.detail = str(e)
+    else:
+        status.state = "cancelled" if progress.cancelled else "done"
+        status.files = progress.files_done
+        status.rows = progress.rows_done
+        status.detail = progress.phone_summary
+
+def queue_summary(statuses, elapsed):
+    states = [status.state for status in statuses]
+    failed = f", {states.count('failed')} failed" if "failed" in states else ""
+    cancelled = f", {states.count('cancelled')} cancelled" if "cancelled" in states else ""
+    files = sum(status.files for status in statuses)
+    rows = sum(status.rows for status in statuses)
+    return f"{states.count('done')}/{len(statuses)} jobs done{failed}{cancelled}, {files} files, {rows:,} rows in {elapsed:.0f}s"
+
+def write_summary(statuses, elapsed, path=summary_file):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump({
+            "finished": datetime.now().isoformat(timespec="seconds"),
+            "elapsed": round(elapsed, 3),
+            "summary": queue_summary(statuses, elapsed),
+            "jobs": [asdict(status) for status in statuses],
+        }, file, indent=2)
+
+def run_queue(entries, workers=None, on_status=None, cancel=None):
+    workers = workers or queue_workers
+    statuses = [JobStatus(entry["file_path"], entry.get("profile", "")) for entry in entries]
+    jobs = []
+    for status, entry in zip(statuses, entries):
+        try:
+            jobs.append(queue_job(entry))
+            error = jobs[-1].validate()
+        except (OSError, TypeError, ValueError) as e:
+            jobs.append(None)
+            error = f"profile {entry.get('profile')!r} could not be read ({e})"
+        if error:
+            status.state = "failed"
+            status.detail = error
+
+    runnable = []
+    for status, job in zip(statuses, jobs):
+        if job is None or status.state != "queued":
+            continue
+        # The first of two jobs writing the same files runs, the other is reported
+        error = output_conflict(job, runnable)
+        if error:
+            status.state = "failed"
+            status.detail = error
+        else:
+            runnable.append(job)
+
+    def changed(index):
+        if on_status:
+            on_status(index, statuses[index])
+
+    for index, status in enumerate(statuses):
+        if status.state == "failed":
+            changed(index)
+
+    started = time.perf_counter()
+    # A managed event can be shared with the worker processes, unlike the caller's threading.Event
+    with Manager() as manager, ProcessPoolExecutor(max_workers=max(min(workers, len(jobs)), 1)) as executor:
+        stop = manager.Event()
+        started_jobs = manager.dict()
+        futures = {executor.submit(run_queued, job, index, started_jobs, stop): index for index, job in enumerate(jobs) if job is not None and statuses[index].state == "queued"}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            if cancel is not None and cancel.is_set() and not stop.is_set():
+                # Running jobs stop after their current file, queued ones never start
+                stop.set()
+                for future in pending:
+                    future.cancel()
+
+            for index in started_jobs.keys():
+                if statuses[index].state == "queued":
+                    statuses[index].state = "running"
+                    changed(index)
+
+            for future in done:
+                finish_status(statuses[futures[future]], future)
+                changed(futures[future])
+
+    elapsed = time.perf_counter() - started
+    write_summary(statuses, elapsed)
+    return statuses, elapsed
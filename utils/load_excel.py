@@ -0,0 +1,91 @@
+import pandas as pd
+from utils.file_formats import read_header, read_table
+from utils.generate_hyperlink import config, excel_column_index_to_letter, excel_column_letter_to_index
+from utils.message_template import compile_template
+from utils.streaming_pipeline import preview_rows, read_preview
+from utils.workbook_cache import cache_key, cache_size_mb, load_cached, store_cached
+
+prune_columns = config.getboolean('loading', 'PRUNE_COLUMNS', fallback=False)
+
+# Excel's last column is XFD
+max_columns = 16384
+
+def remap_column(col_letter, column_map, default=None):
+    if not column_map:
+        return col_letter
+    return column_map.get(col_letter.upper(), default)
+
+def compile_loaded_template(content, data_frame, column_map):
+    if not column_map:
+        return compile_template(content, data_frame.shape[1])
+    # The template still uses the sheet's letters; remap drops refs past the sheet's last column,
+    # unloaded_error stops a run before any other ref is lost
+    return compile_template(content, max_columns).remap(column_map)
+
+def unloaded_error(file_path, format_string, column_map, phone_column, branch_column=""):
+    # A restored state can be edited to use columns the pruned load skipped
+    if not column_map:
+        return None
+    missing = compile_template(format_string, max_columns).columns() - column_map.keys()
+    if missing:
+        # Refs past the sheet's last column are plain text, a full load drops them as well
+        width = len(read_header(file_path))
+        missing = {letter for letter in missing if excel_column_letter_to_index(letter) < width}
+    missing |= {column.upper() for column in (phone_column, branch_column) if column} - column_map.keys()
+    if not missing:
+        return None
+    letters = ", ".join(sorted(missing, key=excel_column_letter_to_index))
+    return f"Column {letters} was not loaded, please select the excel file again" if len(missing) == 1 else f"Columns {letters} were not loaded, please select the excel file again"
+
+def compact_columns(data_frame, phone_position, branch_position):
+    if branch_position is not None:
+        data_frame.isetitem(branch_position, data_frame.iloc[:, branch_position].astype("category"))
+
+    if phone_position is not None:
+        phone = data_frame.iloc[:, phone_position]
+        if pd.api.types.is_numeric_dtype(phone) and (phone.dropna() % 1 == 0).all():
+            # Floats like 9876543210.0 become exact integers, blanks stay as <NA>
+            data_frame.isetitem(phone_position, phone.astype("Int64"))
+        elif phone.dtype == object:
+            data_frame.isetitem(phone_position, phone.astype("string"))
+
+def load_excel(file_path, format_string=None, phone_column="", branch_column="", cache_dir=None, streaming=False):
+    if streaming:
+        return read_preview(file_path), None, f"first {preview_rows:,} rows, the rest is read while generating"
+
+    if not cache_dir or not cache_size_mb:
+        return read_excel(file_path, format_string, phone_column, branch_column)
+
+    # Pruned frames depend on the template and columns they were read for
+    options = (format_string, phone_column.upper(), branch_column.upper()) if prune_columns and format_string is not None else ()
+    key = cache_key(file_path, *options)
+    cached = load_cached(cache_dir, key)
+    if cached is not None:
+        return cached
+
+    loaded = read_excel(file_path, format_string, phone_column, branch_column)
+    store_cached(cache_dir, key, loaded)
+    return loaded
+
+def read_excel(file_path, format_string=None, phone_column="", branch_column=""):
+    if not prune_columns or format_string is None:
+        return read_table(file_path), None, ""
+
+    header = read_header(file_path)
+    template = compile_template(format_string, len(header))
+    letters = template.columns() | {column.upper() for column in (phone_column, branch_column) if column}
+    usecols = sorted(index for index in map(excel_column_letter_to_index, letters) if 0 <= index < len(header))
+
+    data_frame = read_table(file_path, usecols=usecols)
+    column_map = {excel_column_index_to_letter(index): excel_column_index_to_letter(position) for position, index in enumerate(usecols)}
+    loaded_bytes = data_frame.memory_usage(deep=True).sum()
+
+    phone_position = excel_column_letter_to_index(column_map[phone_column.upper()]) if phone_column.upper() in column_map else None
+    branch_position = excel_column_letter_to_index(column_map[branch_column.upper()]) if branch_column.upper() in column_map else None
+    compact_columns(data_frame, phone_position, branch_position)
+
+    # Skipped columns are estimated at the average size of the ones that were read
+    compact_bytes = data_frame.memory_usage(deep=True).sum()
+    full_bytes = loaded_bytes / max(len(usecols), 1) * len(header)
+    report = f"{len(usecols)}/{len(header)} columns, {compact_bytes / 2**20:.1f} MB (~{(full_bytes - compact_bytes) / 2**20:.1f} MB saved)"
+    return data_frame, column_map, report
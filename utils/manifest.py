@@ -0,0 +1,66 @@
+import hashlib
+import json
+import os
+import tempfile
+import pandas as pd
+from utils.generate_hyperlink import config
+
+manifest_name = ".manifest.json"
+
+def settings_digest(template, *columns):
+    # Anything besides the rows that changes what ends up in a file
+    settings = {
+        "config": {section: dict(config[section]) for section in config.sections()},
+        "template": template.msg_index,
+        "tokens": template.tokens,
+        "columns": columns,
+    }
+    return hashlib.sha1(json.dumps(settings, sort_keys=True, default=str).encode()).hexdigest()
+
+def partition_digest(data, settings):
+    digest = hashlib.sha1(settings.encode())
+    digest.update(json.dumps([str(col_name) for col_name in data.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def workbook_digest(sheets, settings):
+    digest = hashlib.sha1(settings.encode())
+    for name, data, _ in sheets:
+        digest.update(name.encode())
+        digest.update(partition_digest(data, settings).encode())
+    return digest.hexdigest()
+
+def source_key(file_path):
+    # Several workbooks can share an output directory, each keeps its own entries
+    return os.path.normcase(os.path.abspath(file_path))
+
+def read_manifest(output_path):
+    try:
+        with open(os.path.join(output_path, manifest_name), "r") as file:
+            return json.load(file).get("sources", {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+def load_manifest(output_path, file_path):
+    return read_manifest(output_path).get(source_key(file_path), {})
+
+def save_manifest(output_path, file_path, files):
+    # Read again right before writing, so entries other workbooks' jobs saved meanwhile are kept.
+    # Two jobs finishing at the very same moment can still lose one update, which only costs a rebuild
+    sources = read_manifest(output_path)
+    sources[source_key(file_path)] = files
+    with tempfile.NamedTemporaryFile("w", dir=output_path, prefix=manifest_name, suffix=".tmp", delete=False) as file:
+        json.dump({"sources": sources}, file, indent=2, sort_keys=True)
+    os.replace(file.name, os.path.join(output_path, manifest_name))
+
+def remove_stale(output_path, previous, current):
+    # Files the last run of this workbook wrote that this one no longer does, like a branch that
+    # is gone or the last chunks after the row count shrank, would otherwise pass for current output
+    removed = 0
+    for file_name in previous.keys() - current.keys():
+        try:
+            os.remove(os.path.join(output_path, file_name))
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
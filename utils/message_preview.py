@@ -0,0 +1,95 @@
+from dataclasses import dataclass, field
+import numpy as np
+from utils.generate_hyperlink import config, excel_column_letter_to_index, max_url_length, render_messages, render_phones
+
+page_rows = config.getint('preview', 'PAGE_ROWS', fallback=20)
+preview_batch_rows = config.getint('preview', 'BATCH_ROWS', fallback=50000)
+
+# render_urls wraps every message in "https://wa.me/<phone>?text=<message>"
+link_overhead = len("https://wa.me/?text=")
+
+# quote() keeps these bytes as they are and turns every other UTF-8 byte into a 3 character %XX escape
+escape_costs = np.full(256, 3, dtype=np.int64)
+escape_costs[np.frombuffer(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_.-~", dtype=np.uint8)] = 1
+
+def encoded_lengths(messages):
+    # Same as len(quote(message, safe="")) for every message, from one pass over all their bytes
+    encoded = [message.encode("utf-8") for message in messages]
+    sizes = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    costs = np.concatenate(([0], np.cumsum(escape_costs[np.frombuffer(b"".join(encoded), dtype=np.uint8)])))
+    ends = np.cumsum(sizes)
+    return costs[ends] - costs[ends - sizes]
+
+@dataclass
+class PreviewStats:
+    rows: int = 0
+    max_length: int = 0
+    p95_length: int = 0
+    over_limit: int = 0
+    missing: dict = field(default_factory=dict)
+
+    def summary(self):
+        missing = ", ".join(f"{name} {count:,}" for name, count in self.missing.items() if count) or "none"
+        return (
+            f"{self.rows:,} rows, link length max {self.max_length:,} / p95 {self.p95_length:,}, "
+            f"{self.over_limit:,} over {max_url_length:,}\nN/A: {missing}"
+        )
+
+class MessagePreview:
+    # Preview of every row of a loaded frame. Only the shown page is rendered; link statistics are
+    # computed batch by batch once per template and phone column, so paging back and forth is instant
+    def __init__(self, data_frame, column_map=None, cache_size=16):
+        self.data_frame = data_frame
+        # Templates are remapped to the pruned frame, but placeholders are shown with the sheet's letters
+        self.letters = {new: old for old, new in (column_map or {}).items()}
+        self.cache_size = cache_size
+        self.stats = {}
+
+    def page_count(self, rows=page_rows):
+        return max(-(-len(self.data_frame) // rows), 1)
+
+    def page(self, template, page, rows=page_rows):
+        start = page * rows
+        messages = template.render(self.data_frame.iloc[start:start + rows])
+        # Sheet rows start below the header
+        return "\n\n".join(f"Row {row}: {message}" for row, message in enumerate(messages, start=start + 2))
+
+    def placeholder(self, kind, value):
+        letter = self.letters.get(value, value)
+        return letter if kind == "column" else f"[{kind.upper()}.{letter}]"
+
+    def cached_stats(self, template, mob_index=None):
+        return self.stats.get((template.tokens, mob_index))
+
+    def link_stats(self, template, mob_index=None, cancel=None):
+        key = (template.tokens, mob_index)
+        if key in self.stats:
+            return self.stats[key]
+
+        lengths = [np.zeros(0, dtype=np.int64)]
+        for start in range(0, len(self.data_frame), preview_batch_rows):
+            if cancel is not None and cancel.is_set():
+                return None
+            data = self.data_frame.iloc[start:start + preview_batch_rows]
+            length = encoded_lengths(render_messages(data, template.tokens)) + link_overhead
+            if mob_index is not None:
+                length += render_phones(data, mob_index).str.len().to_numpy()
+            lengths.append(length)
+        lengths = np.concatenate(lengths)
+
+        missing = {}
+        for kind, value in template.tokens:
+            if kind not in ("text", "ampr"):
+                missing[self.placeholder(kind, value)] = int(self.data_frame.iloc[:, excel_column_letter_to_index(value)].isna().sum())
+
+        stats = PreviewStats(
+            rows=len(lengths),
+            max_length=int(lengths.max(initial=0)),
+            p95_length=int(np.percentile(lengths, 95)) if len(lengths) else 0,
+            over_limit=int((lengths > max_url_length).sum()),
+            missing=missing,
+        )
+        self.stats[key] = stats
+        if len(self.stats) > self.cache_size:
+            self.stats.pop(next(iter(self.stats)))
+        return stats
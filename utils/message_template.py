@@ -0,0 +1,59 @@
+import re
+from functools import lru_cache
+from utils.generate_hyperlink import excel_column_letter_to_index, render_messages, row_marker
+
+pattern = r"([A-Za-z]+)|(\"[^\"]*\")|(\[[A-Za-z]+\.[A-Za-z]+\])"
+
+class MessageTemplate:
+    def __init__(self, tokens, invalid_modes):
+        self.tokens = tuple(tokens)
+        self.invalid_modes = tuple(invalid_modes)
+        self.msg_index = ",".join(MessageTemplate.formula_part(kind, value) for kind, value in self.tokens)
+
+    @staticmethod
+    def formula_part(kind, value):
+        if kind == "text":
+            return '"' + value.replace("&", "%26").replace("\n", "%0A").replace("\t", "%09") + '"'
+
+        cell = f"{value}{row_marker}"
+        if kind == "date":
+            return f'IF(ISBLANK({cell}), "N/A", TEXT({cell},"dd-mm-yyyy"))'
+        elif kind == "ampr":
+            return f'SUBSTITUTE({cell}, "&", "%26")'
+        return f'IF(ISBLANK({cell}), "N/A", {cell})'
+
+    def remap(self, column_map):
+        # Point column refs at a pruned frame; refs to columns that weren't loaded are dropped, callers check
+        # with unloaded_error that these are only refs past the sheet's last column
+        tokens = [(kind, value if kind == "text" else column_map.get(value)) for kind, value in self.tokens]
+        return MessageTemplate([(kind, value) for kind, value in tokens if value is not None], self.invalid_modes)
+
+    def columns(self):
+        return {value for kind, value in self.tokens if kind != "text"}
+
+    def render(self, data):
+        return render_messages(data, self.tokens)
+
+    def preview(self, data_frame, row=0):
+        if data_frame.empty:
+            return ""
+        return self.render(data_frame.iloc[row:row+1]).iat[0]
+
+@lru_cache(maxsize=64)
+def compile_template(content, column_count):
+    tokens = []
+    invalid_modes = []
+    for column, others, square in re.findall(pattern, content, re.MULTILINE):
+        if column:
+            # Unquoted words beyond the last column are plain text typed by mistake, so drop them
+            if excel_column_letter_to_index(column) < column_count:
+                tokens.append(("column", column.upper()))
+        elif others:
+            tokens.append(("text", others[1:-1].replace("\\n", "\n").replace("\\t", "\t")))
+        else:
+            mode, index = square.upper()[1:-1].split('.')
+            if mode not in ("DATE", "AMPR"):
+                invalid_modes.append(mode)
+            elif excel_column_letter_to_index(index) < column_count:
+                tokens.append((mode.lower(), index))
+    return MessageTemplate(tokens, invalid_modes)
@@ -0,0 +1,39 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from utils.generate_hyperlink import save_output
+
+def report_done(done, futures, on_done):
+    for future in done:
+        branch_file_path = futures.pop(future)
+        if future.cancelled():
+            continue
+        timings = future.result()  # Re-raises errors from the worker
+        if on_done:
+            on_done(branch_file_path, timings)
+
+def wait_done(futures, on_done, cancel):
+    # Waits in short steps so a cancel is seen while files are being written, not only between submissions
+    done, _ = wait(futures, timeout=None if cancel is None else 0.1, return_when=FIRST_COMPLETED)
+    if cancel is not None and cancel.is_set():
+        # Files already being written are finished, queued ones are dropped
+        for future in futures:
+            future.cancel()
+    report_done(done, futures, on_done)
+
+def write_parallel(jobs, mob_index, hyperlink_index, template, workers, created=None, on_done=None, cancel=None, save=save_output):
+    futures = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for branch_file_path, data, widths in jobs:
+            if cancel is not None and cancel.is_set():
+                break
+            # One partition per worker is in flight: the executor hands submitted files to its processes
+            # right away, where they can no longer be cancelled, and pickled copies don't pile up.
+            # The next partition is already sliced while waiting, so workers don't sit idle for long
+            while len(futures) >= workers:
+                wait_done(futures, on_done, cancel)
+            if cancel is not None and cancel.is_set():
+                break
+            future = executor.submit(save, data, branch_file_path, mob_index, hyperlink_index, template, created, widths)
+            futures[future] = branch_file_path
+
+        while futures:
+            wait_done(futures, on_done, cancel)
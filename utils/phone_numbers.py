@@ -0,0 +1,159 @@
+import os
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from utils.file_formats import write_table
+from utils.generate_hyperlink import config, country_code, excel_column_letter_to_index, output_format, phone_number_len, split_keys
+
+validate_phones = config.getboolean('whatsapp', 'VALIDATE_PHONES', fallback=False)
+drop_invalid_phones = config.getboolean('whatsapp', 'DROP_INVALID_PHONES', fallback=False)
+deduplicate_phones = config.get('whatsapp', 'DEDUPLICATE_PHONES', fallback='no').strip().lower()
+
+# Longest number E.164 allows, country code included
+max_phone_len = 15
+
+def normalize_numbers(values, numbers, reasons):
+    # Numeric cells can't hold separators or a + prefix, so plain arithmetic is enough
+    local_len = int(phone_number_len)
+    blank = np.isnan(values)
+    whole = ~blank & (values >= 1) & (values == np.floor(values))
+    length = np.where(whole, np.floor(np.log10(np.where(whole, values, 1))) + 1, 0)
+    local = whole & (length == local_len)
+    full = np.where(local, values + int(country_code) * 10.0 ** local_len, values)
+    length = np.where(local, length + len(country_code), length)
+
+    reasons[:] = np.select([blank, ~whole, length <= local_len, length > max_phone_len], ["blank", "not a phone number", "too short", "too long"], "")
+    valid = reasons == ""
+    numbers[valid] = full[valid].astype(np.int64)
+
+def normalize_text(column, numbers, reasons):
+    local_len = int(phone_number_len)
+    # Numbers saved as text through a float, like 9876543210.0 in CSV exports, lose the .0; any other dot is invalid
+    text = column.str.replace(r"[\s\-()]", "", regex=True).str.replace(r"\.0+$", "", regex=True)
+    international = text.str.match(r"\+|00")
+    digits = text.str.replace(r"^(\+|00)", "", regex=True)
+    length = digits.str.len()
+
+    # Numbers without a prefix are local when they have PHONE_NUMBER_LEN digits, optionally after a trunk 0
+    local = ~international & (length == local_len)
+    trunk = ~international & (length == local_len + 1) & digits.str.startswith("0")
+    full = digits.where(~local, country_code + digits).where(~trunk, country_code + digits.str[1:])
+    length = full.str.len()
+
+    reasons[:] = np.select(
+        [(text == "").to_numpy(), ~digits.str.fullmatch(r"\d+").to_numpy(), (length <= local_len).to_numpy(), (length > max_phone_len).to_numpy()],
+        ["blank", "not a phone number", "too short", "too long"],
+        "",
+    )
+    valid = reasons == ""
+    numbers[valid] = full.to_numpy()[valid].astype(np.int64)
+
+def normalize_phones(column):
+    # Returns the full international number of every row (0 where invalid) and why it is invalid ("" when it isn't)
+    numbers = np.zeros(len(column), dtype=np.int64)
+    reasons = np.full(len(column), "", dtype=object)
+    if pd.api.types.is_numeric_dtype(column):
+        normalize_numbers(column.to_numpy(dtype=float, na_value=np.nan), numbers, reasons)
+        return numbers, reasons
+
+    # Mixed columns: only the text cells need string handling, and they keep their leading zeros
+    strings = column.map(type).eq(str).to_numpy()
+    text_numbers, text_reasons = numbers[strings], reasons[strings]
+    normalize_text(column[strings], text_numbers, text_reasons)
+    numbers[strings], reasons[strings] = text_numbers, text_reasons
+    other_numbers, other_reasons = numbers[~strings], reasons[~strings]
+    normalize_numbers(pd.to_numeric(column[~strings], errors="coerce").to_numpy(dtype=float, na_value=np.nan), other_numbers, other_reasons)
+    numbers[~strings], reasons[~strings] = other_numbers, other_reasons
+    return numbers, reasons
+
+class PhoneStage:
+    # Normalizes and validates the phone column before the data is split. Kept across batches
+    # in streaming mode, so duplicates are found against every row seen so far
+    def __init__(self, phone_index, branch_index=""):
+        self.phone_col = excel_column_letter_to_index(phone_index)
+        self.branch_col = excel_column_letter_to_index(branch_index) if branch_index else -1
+        self.seen = {}
+        self.branches = {}
+        self.rows_seen = 0
+        self.exceptions = []
+        self.invalid = 0
+        self.duplicates = 0
+
+    def apply(self, data):
+        # Sheet row of every data row, below the header
+        rows = np.arange(self.rows_seen, self.rows_seen + len(data)) + 2
+        self.rows_seen += len(data)
+        column = data.iloc[:, self.phone_col]
+        numbers, reasons = normalize_phones(column)
+        valid = reasons == ""
+        drop = ~valid if drop_invalid_phones else np.zeros(len(data), dtype=bool)
+        self.invalid += int((~valid).sum())
+
+        if deduplicate_phones in ("branch", "all"):
+            positions = np.flatnonzero(valid)
+            keys = numbers[positions]
+            if deduplicate_phones == "branch" and self.branch_col >= 0:
+                keys = self.branch_keys(data.iloc[positions, self.branch_col], keys)
+            duplicate = self.find_duplicates(pd.Index(keys), rows, positions)
+            reasons[duplicate != 0] = np.char.add("duplicate of row ", duplicate[duplicate != 0].astype(str))
+            drop |= duplicate != 0
+            self.duplicates += int((duplicate != 0).sum())
+
+        flagged = reasons != ""
+        if flagged.any():
+            exceptions = {"Row": rows[flagged]}
+            if self.branch_col >= 0:
+                exceptions["Branch"] = data.iloc[:, self.branch_col].to_numpy()[flagged]
+            exceptions["Phone"] = column.to_numpy()[flagged]
+            exceptions["Reason"] = reasons[flagged]
+            exceptions["Dropped"] = np.where(drop[flagged], "yes", "no")
+            self.exceptions.append(pd.DataFrame(exceptions))
+
+        phones = column.to_numpy(dtype=object).copy()
+        phones[valid] = numbers[valid]
+        data = data.copy(deep=False)
+        data.isetitem(self.phone_col, pd.Series(phones, index=data.index).infer_objects())
+        return data.take(np.flatnonzero(~drop)) if drop.any() else data
+
+    def branch_keys(self, branches, numbers):
+        # Numbers have at most 15 digits, so the branch's code fits above them in one int64
+        codes, uniques = pd.factorize(branches)
+        names = np.append(split_keys(pd.Series(uniques)).to_numpy(), "nan")  # Code -1 is a blank branch
+        branch_codes = np.array([self.branches.setdefault(name, len(self.branches)) for name in names], dtype=np.int64)[codes]
+        if len(self.branches) > np.iinfo(np.int64).max // 10**max_phone_len:
+            return pd.MultiIndex.from_arrays([branch_codes, numbers])
+        return branch_codes * 10**max_phone_len + numbers
+
+    def find_duplicates(self, keys, rows, positions):
+        # Row each contact was first seen on, or 0 for first occurrences and invalid numbers
+        codes, uniques = keys.factorize()
+        first_rows = rows[positions][np.unique(codes, return_index=True)[1]]
+        # The index is a plain dict so it outlives the batch; Python ints and tuples hash much faster than numpy scalars
+        uniques = uniques.tolist()
+        earlier = np.array([self.seen.get(key, 0) for key in uniques], dtype=np.int64)
+        self.seen.update(zip((key for key, row in zip(uniques, earlier) if not row), first_rows[earlier == 0].tolist()))
+        first_rows = np.where(earlier > 0, earlier, first_rows)
+        duplicate = np.zeros(len(rows), dtype=np.int64)
+        duplicate[positions] = np.where(first_rows[codes] != rows[positions], first_rows[codes], 0)
+        return duplicate
+
+    def summary(self):
+        dropped = "dropped" if drop_invalid_phones else "flagged"
+        duplicates = f", {self.duplicates:,} duplicates dropped" if deduplicate_phones in ("branch", "all") else ""
+        return f"{self.invalid:,} invalid phone numbers {dropped}{duplicates}"
+
+    def write_report(self, file_path, output_path, dated=True):
+        base_name = os.path.splitext(os.path.basename(file_path))[0]
+        date_suffix = f"_{datetime.now().strftime('%d-%m-%Y')}" if dated else ""
+        report_path = os.path.join(output_path, f"_EXCEPTIONS__[{base_name}]{date_suffix}.{output_format}")
+        if not self.exceptions:
+            # An undated report from an earlier run would no longer be true
+            if os.path.exists(report_path):
+                os.remove(report_path)
+            return None
+        exceptions = pd.concat(self.exceptions, ignore_index=True)
+        if output_format == "xlsx":
+            exceptions.to_excel(report_path, index=False)
+        else:
+            write_table(exceptions, report_path)
+        return report_path
@@ -0,0 +1,99 @@
+import cProfile
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from utils.app_config import config
+
+profiling_enabled = config.getboolean('profiling', 'ENABLED', fallback=False)
+profiler = config.get('profiling', 'PROFILER', fallback='').strip().lower()
+
+class RunReport:
+    def __init__(self, job=None):
+        self.started = datetime.now()
+        self.job = job.to_state() if job is not None else None
+        self.stages = {}
+        self.files = []
+        self.profile = {}
+
+    def add_stage(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(stage, time.perf_counter() - start)
+
+    def add_file(self, file_path, rows, timings):
+        for stage, seconds in timings.items():
+            self.add_stage(stage, seconds)
+        self.files.append({
+            "file": os.path.basename(file_path),
+            "rows": rows,
+            "bytes": os.path.getsize(file_path) if os.path.exists(file_path) else None,
+            "stages": {stage: round(seconds, 4) for stage, seconds in timings.items()},
+        })
+
+    def summary(self):
+        total = sum(self.stages.values())
+        if not total:
+            return ""
+        stage, seconds = max(self.stages.items(), key=lambda item: item[1])
+        return f"{total:.1f}s in stages, slowest {stage} {seconds:.1f}s ({seconds / total:.0%})"
+
+    def to_dict(self):
+        return {
+            "started": self.started.isoformat(timespec="seconds"),
+            "job": self.job,
+            "files": self.files,
+            "totals": {
+                "files": len(self.files),
+                "rows": sum(entry["rows"] for entry in self.files),
+                "bytes": sum(entry["bytes"] or 0 for entry in self.files),
+                "stages": {stage: round(seconds, 4) for stage, seconds in self.stages.items()},
+            },
+            "profile": self.profile,
+        }
+
+    def write(self, path):
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
+        return path
+
+@contextmanager
+def profiled(report, mode, profile_path):
+    # Only the calling process is profiled; parallel writers report their stage timings instead
+    if mode == "cprofile":
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(profile_path)
+            stats = pstats.Stats(profile).sort_stats("cumulative")
+            top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:15]
+            report.profile = {
+                "cprofile": profile_path,
+                "top": [{"function": f"{os.path.basename(file)}:{line}({name})", "calls": calls, "cumtime": round(cumtime, 4)} for (file, line, name), (_, calls, _, cumtime, _) in top],
+            }
+    elif mode == "tracemalloc":
+        tracemalloc.start()
+        try:
+            yield
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:10]
+            tracemalloc.stop()
+            report.profile = {
+                "tracemalloc_peak_mb": round(peak / 2**20, 1),
+                "top": [{"line": str(stat.traceback), "size_mb": round(stat.size / 2**20, 2)} for stat in top],
+            }
+    else:
+        yield
@@ -0,0 +1,266 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Manager, freeze_support
+from urllib.parse import parse_qs, unquote, urlparse
+from utils.engine import data_dir
+from utils.generate_hyperlink import config
+from utils.job_queue import JobStatus, finish_status, queue_job, run_queued
+
+server_host = config.get('server', 'HOST', fallback='127.0.0.1').strip()
+server_port = config.getint('server', 'PORT', fallback=8765)
+server_workers = config.getint('server', 'WORKERS', fallback=2) or os.cpu_count()
+keep_hours = config.getfloat('server', 'KEEP_HOURS', fallback=24)
+
+server_dir = os.path.join(data_dir, "server")
+upload_dir = os.path.join(server_dir, "uploads")
+jobs_dir = os.path.join(server_dir, "jobs")
+upload_extensions = (".xlsx", ".xls", ".csv", ".parquet")
+
+def store_upload(stream, length, name):
+    # Uploads are stored in a folder named after their content hash: the same export sent twice is one file
+    # with one modification time, so the parsed-workbook cache from the first request serves the second.
+    # The file keeps its own name, which the generated files are named after
+    name = os.path.basename(name.replace("\\", "/"))
+    extension = os.path.splitext(name)[1].lower()
+    if extension not in upload_extensions:
+        raise ValueError(f"Unsupported file type {extension!r}, expected one of {', '.join(upload_extensions)}")
+
+    os.makedirs(upload_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=upload_dir, suffix=".part", delete=False) as file:
+        remaining = length
+        while remaining:
+            block = stream.read(min(remaining, 2**20))
+            if not block:
+                break
+            digest.update(block)
+            file.write(block)
+            remaining -= len(block)
+    if remaining:
+        os.remove(file.name)
+        raise ValueError("The upload ended before Content-Length bytes were received")
+
+    file_path = os.path.join(upload_dir, digest.hexdigest(), name)
+    if os.path.exists(file_path):
+        os.remove(file.name)
+        os.utime(os.path.dirname(file_path))  # Sent again, so it is kept as long as a new upload
+    else:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        os.replace(file.name, file_path)
+    return file_path
+
+class JobService:
+    # Runs submitted jobs in a pool of worker processes and keeps their status for the request handlers
+    def __init__(self, workers=None):
+        self.manager = Manager()
+        self.started = self.manager.dict()
+        self.executor = ProcessPoolExecutor(max_workers=workers or server_workers)
+        self.lock = threading.Lock()
+        self.statuses = {}
+        self.running = {}
+        self.finished_at = {}
+        self.cleaned = 0.0
+
+    def submit(self, entry):
+        self.clean_up()
+        job_id = uuid.uuid4().hex[:12]
+        # Every job writes to a folder of its own, whatever output path its profile names
+        job = queue_job({**entry, "output_path": os.path.join(jobs_dir, job_id)})
+        error = job.validate() or (None if os.path.isfile(job.file_path) else f"{job.file_path} does not exist")
+        if error:
+            raise ValueError(error)
+        if os.path.dirname(os.path.dirname(os.path.abspath(job.file_path))) == os.path.abspath(upload_dir):
+            # An upload used again by its path is kept as long as a new one
+            os.utime(os.path.dirname(job.file_path))
+
+        cancel = self.manager.Event()
+        with self.lock:
+            self.statuses[job_id] = JobStatus(job.file_path, entry.get("profile", ""))
+            # Results are one zip, so a single download delivers the job
+            future = self.executor.submit(run_queued, job, job_id, self.started, cancel, True)
+            self.running[job_id] = (future, cancel)
+        future.add_done_callback(partial(self.finished, job_id))
+        return job_id
+
+    def finished(self, job_id, future):
+        with self.lock:
+            finish_status(self.statuses[job_id], future)
+            self.running.pop(job_id, None)
+            self.finished_at[job_id] = time.time()
+
+    def status(self, job_id):
+        with self.lock:
+            status = self.statuses.get(job_id)
+            if status is None:
+                return None
+            if status.state == "queued" and self.started.get(job_id):
+                status.state = "running"
+            # "files" is the number of generated files, the job folder's contents are listed apart
+            return {"id": job_id, **asdict(status), "summary": status.summary(), "output_files": self.files(job_id)}
+
+    def list(self):
+        return [self.status(job_id) for job_id in list(self.statuses)]
+
+    def cancel(self, job_id):
+        with self.lock:
+            if job_id not in self.statuses:
+                return False
+            future, cancel = self.running.get(job_id, (None, None))
+        if future is not None:
+            # Queued jobs never start, running ones stop after their current file
+            cancel.set()
+            future.cancel()
+        return True
+
+    def files(self, job_id):
+        output_path = os.path.join(jobs_dir, job_id)
+        return sorted(os.listdir(output_path)) if os.path.isdir(output_path) else []
+
+    def file_path(self, job_id, name=None):
+        # Only the finished job's own files can be downloaded
+        with self.lock:
+            status = self.statuses.get(job_id)
+            if status is None or status.state != "done":
+                return None
+        files = self.files(job_id)
+        if name is None:
+            name = next((file_name for file_name in files if file_name.startswith("_ARCHIVE_")), None)
+        if name not in files:
+            return None
+        return os.path.join(jobs_dir, job_id, name)
+
+    def clean_up(self, interval=60):
+        # Finished jobs, their files and uploads no job is using are removed KEEP_HOURS after they were
+        # last touched, so a long-running server doesn't fill its disk; leftovers of earlier runs go too
+        now = time.time()
+        expired = now - keep_hours * 3600
+        with self.lock:
+            if not keep_hours or now - self.cleaned < interval:
+                return
+            self.cleaned = now
+            active = {job_id for job_id, status in self.statuses.items() if status.state in ("queued", "running")}
+            in_use = {os.path.abspath(self.statuses[job_id].file_path) for job_id in active}
+            for job_id in [job_id for job_id, finished in self.finished_at.items() if finished < expired]:
+                self.statuses.pop(job_id, None)
+                self.finished_at.pop(job_id)
+            known = set(self.statuses)
+
+        for job_id in os.listdir(jobs_dir) if os.path.isdir(jobs_dir) else []:
+            path = os.path.join(jobs_dir, job_id)
+            if job_id not in known and os.path.getmtime(path) < expired:
+                shutil.rmtree(path, ignore_errors=True)
+
+        for name in os.listdir(upload_dir) if os.path.isdir(upload_dir) else []:
+            path = os.path.join(upload_dir, name)
+            if os.path.getmtime(path) >= expired or any(file_path.startswith(path + os.sep) for file_path in in_use):
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)  # A .part file of an upload that never finished
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+        self.manager.shutdown()
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    # POST /uploads?name=export.xlsx   body: the workbook      -> {"file_path": ...}
+    # POST /jobs                       body: state_data.json fields, optionally "profile" -> {"id": ...}
+    # GET  /jobs, GET /jobs/<id>, GET /jobs/<id>/result, GET /jobs/<id>/files/<name>, DELETE /jobs/<id>
+    def route(self):
+        url = urlparse(self.path)
+        return [unquote(part) for part in url.path.strip("/").split("/") if part], parse_qs(url.query)
+
+    def do_POST(self):
+        parts, query = self.route()
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            if parts == ["uploads"]:
+                self.server.service.clean_up()
+                file_path = store_upload(self.rfile, length, query.get("name", [""])[0])
+                return self.send_json(201, {"file_path": file_path})
+            if parts == ["jobs"]:
+                entry = json.loads(self.rfile.read(length) or b"{}")
+                job_id = self.server.service.submit(entry)
+                return self.send_json(202, {"id": job_id, "status": f"/jobs/{job_id}", "result": f"/jobs/{job_id}/result"})
+        except (OSError, TypeError, ValueError) as e:
+            # Bad JSON, a missing profile or setting, or an invalid upload
+            return self.send_json(400, {"error": str(e)})
+        self.send_json(404, {"error": "Not found"})
+
+    def do_GET(self):
+        parts, _ = self.route()
+        service = self.server.service
+        if parts == ["jobs"]:
+            return self.send_json(200, {"jobs": service.list()})
+        if len(parts) == 2 and parts[0] == "jobs":
+            status = service.status(parts[1])
+            return self.send_json(200, status) if status else self.send_json(404, {"error": "Unknown job"})
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "result":
+            return self.send_file(service.file_path(parts[1]))
+        if len(parts) == 4 and parts[0] == "jobs" and parts[2] == "files":
+            return self.send_file(service.file_path(parts[1], parts[3]))
+        self.send_json(404, {"error": "Not found"})
+
+    def do_DELETE(self):
+        parts, _ = self.route()
+        if len(parts) == 2 and parts[0] == "jobs" and self.server.service.cancel(parts[1]):
+            return self.send_json(200, self.server.service.status(parts[1]))
+        self.send_json(404, {"error": "Unknown job"})
+
+    def send_json(self, code, body):
+        payload = json.dumps(body, indent=2).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_file(self, file_path):
+        if file_path is None:
+            return self.send_json(404, {"error": "No such file, or the job has not finished"})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(os.path.getsize(file_path)))
+        self.send_header("Content-Disposition", f'attachment; filename="{os.path.basename(file_path)}"')
+        self.end_headers()
+        with open(file_path, "rb") as file:
+            shutil.copyfileobj(file, self.wfile)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m utils.server", description="Serve WhatsApp message generation to the team over HTTP.")
+    parser.add_argument("--host", default=server_host, help=f"address to listen on (default: {server_host})")
+    parser.add_argument("--port", type=int, default=server_port, help=f"port to listen on (default: {server_port})")
+    parser.add_argument("--workers", type=int, default=server_workers, help=f"jobs processed at the same time (default: {server_workers})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    service = JobService(args.workers)
+    server = ThreadingHTTPServer((args.host, args.port), ServiceHandler)
+    server.service = service
+    print(f"[info]: Serving on http://{args.host}:{server.server_port} with {args.workers} workers, files in {server_dir}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+if __name__ == "__main__":
+    freeze_support()
+    sys.exit(main())
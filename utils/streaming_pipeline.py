@@ -0,0 +1,137 @@
+import os
+import pickle
+import tempfile
+import pandas as pd
+from utils.file_formats import count_rows, read_batches, read_table
+from utils.generate_hyperlink import (
+    config, excel_column_letter_to_index, file_chunk_size, generate_file_path, max_sheet_rows, part_name, part_sizes, split_keys,
+)
+
+streaming_enabled = config.getboolean('streaming', 'ENABLED', fallback=False)
+batch_rows = config.getint('streaming', 'BATCH_ROWS', fallback=10000)
+memory_budget_mb = config.getint('streaming', 'MEMORY_BUDGET_MB', fallback=256)
+preview_rows = config.getint('streaming', 'PREVIEW_ROWS', fallback=1000)
+
+def read_preview(file_path):
+    # Only the first rows are loaded up front; the GUI needs them for the column count and preview
+    return read_table(file_path, nrows=preview_rows)
+
+class PartitionSpill:
+    # Rows of each output file wait here until the source is fully read; once the buffers
+    # go over the memory budget the largest ones are appended to pickle files on disk
+    def __init__(self, budget_bytes=memory_budget_mb * 2**20):
+        self.budget_bytes = budget_bytes
+        self.directory = tempfile.TemporaryDirectory(prefix="spill_")
+        self.buffers = {}
+        self.sizes = {}
+        self.files = {}
+        self.rows = {}
+        self.buffered = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.directory.cleanup()
+
+    def add(self, name, data_frame, nbytes):
+        if name not in self.buffers:
+            self.buffers[name] = []
+            self.sizes[name] = 0
+            self.rows[name] = 0
+        self.buffers[name].append(data_frame)
+        self.sizes[name] += nbytes
+        self.rows[name] += len(data_frame)
+        self.buffered += nbytes
+        if self.buffered > self.budget_bytes:
+            # Spilling down to half the budget keeps small partitions from being written out one batch at a time
+            for largest in sorted(self.sizes, key=self.sizes.get, reverse=True):
+                if self.buffered <= self.budget_bytes // 2:
+                    break
+                self.spill(largest)
+
+    def spill(self, name):
+        if name not in self.files:
+            self.files[name] = os.path.join(self.directory.name, f"{len(self.files)}.pkl")
+        with open(self.files[name], "ab") as file:
+            for data_frame in self.buffers[name]:
+                pickle.dump(data_frame, file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.buffered -= self.sizes[name]
+        self.buffers[name] = []
+        self.sizes[name] = 0
+
+    def batches(self, name):
+        # Spilled rows always come before the buffered ones, so file order is kept
+        if name in self.files:
+            with open(self.files[name], "rb") as file:
+                while True:
+                    try:
+                        yield pickle.load(file)
+                    except EOFError:
+                        break
+            os.remove(self.files.pop(name))
+        buffers = self.buffers.pop(name)
+        self.buffered -= self.sizes.pop(name)
+        yield from buffers
+
+def route_partitions(batches, branch_index, spill, cancel=None):
+    # Returns the file name of every key, settled once the whole column has been seen
+    col_index = excel_column_letter_to_index(branch_index)
+    numeric, floats = True, False
+    for batch in batches:
+        if cancel is not None and cancel.is_set():
+            break
+        column = batch.iloc[:, col_index]
+        if column.notna().any():
+            numeric = numeric and (pd.api.types.is_integer_dtype(column) or pd.api.types.is_float_dtype(column))
+        floats = floats or pd.api.types.is_float_dtype(column) or column.isna().any()
+        row_bytes = batch.memory_usage(deep=True).sum() / max(len(batch), 1)
+        keys = split_keys(column)
+        for branch_name, rows in keys.groupby(keys, sort=False).indices.items():
+            spill.add(branch_name, batch.take(rows), row_bytes * len(rows))
+
+    # Loaded whole, a numeric column with any blank or fraction is float, so 512 is named "512.0" there too
+    as_float = numeric and floats
+    return {key: f"{key}.0" if as_float and key.lstrip("-").isdigit() else key for key in spill.rows}
+
+def chunk_batches(batches, chunk_size):
+    # Yields one generator per output file; each must be used up before asking for the next
+    batches = iter(batches)
+    pending = next(batches, None)
+
+    def chunk():
+        nonlocal pending
+        remaining = chunk_size
+        while remaining and pending is not None:
+            data, pending = pending.iloc[:remaining], pending.iloc[remaining:]
+            remaining -= len(data)
+            if pending.empty:
+                pending = next(batches, None)
+            yield data
+
+    while pending is not None:
+        yield chunk()
+
+def spilled_jobs(file_path, output_path, spill, names):
+    for key, branch_name in names.items():
+        if len(part_sizes(spill.rows[key])) == 1:
+            yield generate_file_path(branch_name, file_path, output_path, 0, False), spill.batches(key)
+            continue
+        # Split values too large for one sheet are cut into sheet-sized files like in chunk mode
+        for part, chunk in enumerate(chunk_batches(spill.batches(key), max_sheet_rows)):
+            yield generate_file_path(part_name(branch_name, part), file_path, output_path, 0, False), chunk
+
+def stream_jobs(file_path, output_path, branch_index, columns, spill, chunk_size=200, cancel=None, phones=None):
+    # Returns the number of files and rows, and a generator of (path, batches) pairs
+    batches = read_batches(file_path, columns, batch_rows)
+    if phones is not None:
+        batches = map(phones.apply, batches)
+    if branch_index and excel_column_letter_to_index(branch_index) > -1:
+        names = route_partitions(batches, branch_index, spill, cancel)
+        files_total = sum(len(part_sizes(rows)) for rows in spill.rows.values())
+        return files_total, sum(spill.rows.values()), spilled_jobs(file_path, output_path, spill, names)
+
+    rows_total = count_rows(file_path)
+    chunk_size = file_chunk_size(chunk_size)
+    jobs = ((generate_file_path("", file_path, output_path, i, True), chunk) for i, chunk in enumerate(chunk_batches(batches, chunk_size)))
+    return -(-rows_total // chunk_size), rows_total, jobs
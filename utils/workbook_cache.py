@@ -0,0 +1,60 @@
+import hashlib
+import os
+import pickle
+from utils.generate_hyperlink import config
+
+cache_size_mb = config.getint('loading', 'CACHE_SIZE_MB', fallback=0)
+
+def cache_key(file_path, *options):
+    # Any edit to the workbook changes its size or mtime, which invalidates the entry
+    stat = os.stat(file_path)
+    key = repr((os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, options))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def load_cached(cache_dir, key):
+    path = os.path.join(cache_dir, f"{key}.pkl")
+    try:
+        with open(path, "rb") as file:
+            value = pickle.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # Truncated entries, and ones pickled by another pandas or numpy version, fail in many ways;
+        # all of them are a miss, and the entry is dropped so the workbook is parsed and cached afresh
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    os.utime(path)  # Mark as recently used for eviction
+    return value
+
+def store_cached(cache_dir, key, value):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{key}.pkl")
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as file:
+        pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+    evict_cached(cache_dir, cache_size_mb * 2**20)
+
+def evict_cached(cache_dir, max_bytes):
+    # Queued jobs share the cache, so another process may remove an entry while we look at it
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(".pkl"):
+            try:
+                stat = os.stat(os.path.join(cache_dir, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, name))
+        except FileNotFoundError:
+            pass
+        total -= size
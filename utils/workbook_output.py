@@ -0,0 +1,114 @@
+import os
+import re
+import time
+from datetime import datetime
+import pandas as pd
+from utils.generate_hyperlink import (
+    add_hyperlink_formula, add_hyperlink_urls, adjust_column_width, config, lap, partition_slices, render_urls,
+)
+from utils import generate_hyperlink
+
+workbook_output = config.getboolean('generation', 'WORKBOOK_OUTPUT', fallback=False)
+sheets_per_workbook = config.getint('generation', 'SHEETS_PER_WORKBOOK', fallback=0)
+workbook_rows = config.getint('generation', 'WORKBOOK_ROWS', fallback=0)
+
+index_sheet = "Index"
+invalid_sheet_chars = re.compile(r"[\[\]:*?/\\]")
+max_sheet_name = 31
+
+def sheet_name(branch_name, i, no_branch_col, used):
+    # Excel sheet names are at most 31 characters, can't hold []:*?/\ and are unique ignoring case
+    name = invalid_sheet_chars.sub("_", f"_ALL_{i+1}" if no_branch_col else str(branch_name)).strip("'")[:max_sheet_name] or "_"
+    candidate = name
+    count = 1
+    while candidate.lower() in used:
+        count += 1
+        suffix = f"~{count}"
+        candidate = name[:max_sheet_name - len(suffix)] + suffix
+    used.add(candidate.lower())
+    return candidate
+
+def workbook_file_path(file_path, output_path, i, dated=True):
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    date_suffix = f"_{datetime.now().strftime('%d-%m-%Y')}" if dated else ""
+    return os.path.join(output_path, f"_BOOK_{i+1}__[{base_name}]{date_suffix}.xlsx")
+
+def rolls_over(sheet_count, rows, next_rows):
+    if not sheet_count:
+        return False
+    if sheets_per_workbook and sheet_count >= sheets_per_workbook:
+        return True
+    return bool(workbook_rows) and rows + next_rows > workbook_rows
+
+def count_workbooks(sizes):
+    count = 0
+    sheet_count = rows = 0
+    for size in sizes:
+        if rolls_over(sheet_count, rows, size):
+            count += 1
+            sheet_count = rows = 0
+        sheet_count += 1
+        rows += size
+    return count + bool(sheet_count)
+
+def sheet_rows(sheets):
+    return sum(len(data) for _, data, _ in sheets)
+
+def workbook_jobs(data_frame, file_path, output_path, branch_index, chunk_size=200, partitions=None, dated=True):
+    # Like partition_jobs, but each job is a list of (sheet_name, data, widths) for one workbook
+    book = 0
+    sheets = []
+    rows = 0
+    used = {index_sheet.lower()}
+    for branch_name, i, no_branch_col, data, widths in partition_slices(data_frame, branch_index, chunk_size, partitions):
+        if rolls_over(len(sheets), rows, len(data)):
+            yield workbook_file_path(file_path, output_path, book, dated), sheets, None
+            book += 1
+            sheets = []
+            rows = 0
+            used = {index_sheet.lower()}
+        sheets.append((sheet_name(branch_name, i, no_branch_col, used), data, widths))
+        rows += len(data)
+    if sheets:
+        yield workbook_file_path(file_path, output_path, book, dated), sheets, None
+
+def write_index(workbook, worksheet, sheets):
+    header_format = workbook.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+    worksheet.write_row(0, 0, ["Sheet", "Rows"], header_format)
+    for row_index, (name, data, _) in enumerate(sheets, start=1):
+        # Quotes inside a sheet reference are doubled
+        quoted = name.replace("'", "''")
+        worksheet.write_url(row_index, 0, f"internal:'{quoted}'!A1", string=name)
+        worksheet.write_number(row_index, 1, len(data))
+    worksheet.set_column(0, 0, max([len(index_sheet)] + [len(name) for name, _, _ in sheets]))
+    worksheet.set_column(1, 1, 10)
+
+def save_sheets(sheets, file_path, mob_index, hyperlink_index, template, created=None, widths=None):
+    # Same stages as save_to_excel, summed over the sheets of the workbook
+    timings = {}
+    start = time.perf_counter()
+    writer = pd.ExcelWriter(file_path, engine='xlsxwriter')
+    if created is not None:
+        writer.book.set_properties({"created": created})
+    index = writer.book.add_worksheet(index_sheet)
+
+    for name, data, sheet_widths in sheets:
+        urls = None
+        if generate_hyperlink.link_mode == "url":
+            urls = render_urls(data, mob_index, template.tokens)
+            start = lap(timings, "render_urls", start)
+        data.to_excel(writer, sheet_name=name, index=False)
+        start = lap(timings, "to_excel", start)
+        worksheet = writer.sheets[name]
+        if urls is not None:
+            add_hyperlink_urls(worksheet, urls, hyperlink_index)
+        else:
+            add_hyperlink_formula(worksheet, data, mob_index, hyperlink_index, template)
+        start = lap(timings, "add_hyperlink_formula", start)
+        adjust_column_width(worksheet, data, sheet_widths)
+        start = lap(timings, "adjust_column_width", start)
+
+    write_index(writer.book, index, sheets)
+    writer._save()
+    lap(timings, "save", start)
+    return timings